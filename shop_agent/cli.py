@@ -1,13 +1,19 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import mimetypes
+from pathlib import Path
 
-from shop_agent.db import Message, get_session, init_db
-from shop_agent.gemini_client import GeminiClient
+from sqlalchemy import insert
+
+from shop_agent.db import Case, Message, get_session, init_db
+from shop_agent.gemini_client import aclose_gemini_client, get_gemini_client
+from shop_agent.nlu_cache import get_nlu_cache
 from shop_agent.orchestrator import DialogManager
 
 
-def main() -> None:
+async def main_async() -> None:
     parser = argparse.ArgumentParser(description="Shop agent CLI")
     parser.add_argument("session_id", help="Session identifier")
     parser.add_argument("message", help="User message")
@@ -15,32 +21,43 @@ def main() -> None:
     args = parser.parse_args()
 
     init_db()
-    gemini = GeminiClient()
-    orchestrator = DialogManager(gemini)
+    orchestrator = DialogManager(get_gemini_client(), cache=get_nlu_cache())
     session = get_session()
-    case = session.query(__case_model()).filter_by(session_id=args.session_id).first()
-    if case is None:
-        case = __case_model()(session_id=args.session_id)
-        session.add(case)
+    try:
+        case = (
+            session.query(Case)
+            .filter_by(session_id=args.session_id)
+            .order_by(Case.id.desc())
+            .first()
+        )
+        if case is None:
+            case = Case(session_id=args.session_id)
+            session.add(case)
+            session.flush()
+        image_bytes = None
+        image_mime_type = None
+        if args.image:
+            image_bytes = Path(args.image).read_bytes()
+            image_mime_type, _ = mimetypes.guess_type(args.image)
+        response, _, _ = await orchestrator.ahandle_turn(
+            case, args.message, image_bytes=image_bytes, image_mime_type=image_mime_type
+        )
+        session.execute(
+            insert(Message),
+            [
+                {"case_id": case.id, "role": "user", "text": args.message},
+                {"case_id": case.id, "role": "assistant", "text": response},
+            ],
+        )
         session.commit()
-        session.refresh(case)
-    session.add(Message(case_id=case.id, role="user", text=args.message))
-    session.commit()
-    image_bytes = None
-    if args.image:
-        image_bytes = open(args.image, "rb").read()
-    response, _, _ = orchestrator.handle_turn(case, args.message, image_bytes=image_bytes)
-    session.add(case)
-    session.commit()
-    session.add(Message(case_id=case.id, role="assistant", text=response))
-    session.commit()
+    finally:
+        session.close()
+        await aclose_gemini_client()
     print(response)
 
 
-def __case_model():
-    from shop_agent.db import Case
-
-    return Case
+def main() -> None:
+    asyncio.run(main_async())
 
 
 if __name__ == "__main__":
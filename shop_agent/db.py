@@ -1,11 +1,38 @@
 from __future__ import annotations
 
+import functools
 import os
-from datetime import datetime
-from typing import Any, Dict, Optional
-
-from sqlalchemy import JSON, Boolean, DateTime, Float, Integer, String, Text, create_engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, sessionmaker
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    Text,
+    create_engine,
+    event,
+    inspect,
+    text,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    Session,
+    mapped_column,
+    relationship,
+    sessionmaker,
+)
 
 
 def _database_url() -> str:
@@ -15,21 +42,76 @@ def _database_url() -> str:
     return "sqlite:///./shop_agent.db"
 
 
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "cache_size=-20000",
+)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+psycopg",
+    "postgresql+psycopg2": "postgresql+psycopg",
+}
+ASYNC_POOL_SIZE = 20
+ASYNC_MAX_OVERFLOW = 40
+
+
+def _sqlite_pragmas(dbapi_conn: Any, _: Any) -> None:
+    cursor = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
 engine = create_engine(_database_url(), future=True)
+if engine.url.drivername.startswith("sqlite"):
+    event.listen(engine, "connect", _sqlite_pragmas)
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 
+@functools.lru_cache(maxsize=1)
+def get_async_engine() -> AsyncEngine:
+    url = engine.url.set(drivername=ASYNC_DRIVERS.get(engine.url.drivername, engine.url.drivername))
+    options: Dict[str, Any] = {"pool_pre_ping": True}
+    if not url.drivername.startswith("sqlite"):
+        options.update(pool_size=ASYNC_POOL_SIZE, max_overflow=ASYNC_MAX_OVERFLOW)
+    try:
+        async_engine = create_async_engine(url, **options)
+    except ImportError as exc:
+        raise RuntimeError(
+            f"The async server needs the {url.drivername!r} driver for DATABASE_URL; "
+            "for PostgreSQL install the postgres extra (psycopg 3)."
+        ) from exc
+    if url.drivername.startswith("sqlite"):
+        event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+    return async_engine
+
+
+@functools.lru_cache(maxsize=1)
+def _async_session_factory() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Base(DeclarativeBase):
     pass
 
 
 class Case(Base):
     __tablename__ = "cases"
+    __table_args__ = (Index("ix_cases_session_latest", "session_id", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    session_id: Mapped[str] = mapped_column(String(128), index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, onupdate=_utcnow)
+    session_id: Mapped[str] = mapped_column(String(128))
     category: Mapped[Optional[str]] = mapped_column(String(64))
     intent: Mapped[Optional[str]] = mapped_column(String(64))
     decision: Mapped[Optional[str]] = mapped_column(String(64))
@@ -47,8 +129,10 @@ class Case(Base):
     pickup_address_json: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON)
     ticket_number: Mapped[Optional[str]] = mapped_column(String(16))
     asked_slots: Mapped[Optional[str]] = mapped_column(Text)
+    asked_slots_mask: Mapped[Optional[int]] = mapped_column(Integer)
     last_question_slot: Mapped[Optional[str]] = mapped_column(String(64))
     turn_count: Mapped[int] = mapped_column(Integer, default=0)
+    nlu_complete: Mapped[Optional[bool]] = mapped_column(Boolean)
     requested_action: Mapped[Optional[str]] = mapped_column(String(64))
     user_sentiment: Mapped[Optional[str]] = mapped_column(String(32))
     emergency_trigger: Mapped[Optional[bool]] = mapped_column(Boolean)
@@ -56,13 +140,27 @@ class Case(Base):
     amazon_asin: Mapped[Optional[str]] = mapped_column(String(32))
     purchase_price: Mapped[Optional[float]] = mapped_column(Float)
 
+    messages: Mapped[List["Message"]] = relationship(
+        primaryjoin="Case.id == foreign(Message.case_id)",
+        order_by="(Message.created_at, Message.id)",
+        viewonly=True,
+        lazy="raise",
+    )
+    attachments: Mapped[List["Attachment"]] = relationship(
+        primaryjoin="Case.id == foreign(Attachment.case_id)",
+        order_by="Attachment.id",
+        viewonly=True,
+        lazy="raise",
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_case_created", "case_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    case_id: Mapped[int] = mapped_column(Integer, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    case_id: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow)
     role: Mapped[str] = mapped_column(String(16))
     text: Mapped[str] = mapped_column(Text)
 
@@ -72,15 +170,39 @@ class Attachment(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     case_id: Mapped[int] = mapped_column(Integer, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow)
     filename: Mapped[str] = mapped_column(String(256))
     content_type: Mapped[Optional[str]] = mapped_column(String(128))
     storage_path: Mapped[str] = mapped_column(String(512))
 
 
+def _add_missing_columns() -> None:
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}")
+                )
+
+
 def init_db() -> None:
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 def get_session() -> Session:
     return SessionLocal()
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with _async_session_factory()() as session:
+        yield session
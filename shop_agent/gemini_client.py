@@ -1,16 +1,71 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import logging
 import os
-from typing import Optional, TypeVar
+import random
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, TypeVar
 
-from google import genai
-from google.genai import types
+if TYPE_CHECKING:
+    from google.genai import types
 
 
 MODEL_NAME = "gemini-2.5-flash"
+DEFAULT_IMAGE_MIME_TYPE = "image/jpeg"
+HTTP_MAX_CONNECTIONS = 32
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 16
+RATE_LIMIT_STATUS = 429
+RETRY_ATTEMPTS = 5
+RETRY_INITIAL_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+IMAGE_PART_CACHE_SIZE = 16
 
 
+logger = logging.getLogger(__name__)
+
 ModelT = TypeVar("ModelT")
+ResultT = TypeVar("ResultT")
+
+_part_cache: OrderedDict[tuple[bytes, str], types.Part] = OrderedDict()
+
+
+@functools.lru_cache(maxsize=32)
+def _schema_dict(schema_model: type) -> dict[str, Any]:
+    return schema_model.model_json_schema()
+
+
+def _max_concurrency() -> int:
+    return max(1, int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")))
+
+
+def _backoff_delay(attempt: int) -> float:
+    delay = min(RETRY_MAX_DELAY, RETRY_INITIAL_DELAY * (2**attempt))
+    return delay + random.uniform(0, RETRY_INITIAL_DELAY)
+
+
+def _log_usage(response: Any) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None or not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug(
+        "Gemini usage: prompt_tokens=%s cached_tokens=%s output_tokens=%s",
+        usage.prompt_token_count,
+        usage.cached_content_token_count,
+        usage.candidates_token_count,
+    )
+
+
+def _ensure_no_running_loop(method: str) -> None:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    raise RuntimeError(
+        f"GeminiClient.{method} blocks the event loop; await GeminiClient.a{method} instead."
+    )
 
 
 class GeminiClient:
@@ -18,27 +73,83 @@ class GeminiClient:
         key = api_key or os.getenv("GEMINI_API_KEY")
         if not key:
             raise RuntimeError("GEMINI_API_KEY environment variable is required.")
-        self.client = genai.Client(api_key=key)
+        import httpx
+        from google import genai
+        from google.genai import errors, types
+
+        self._types = types
+        self._errors = errors
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        )
+        self._http = httpx.Client(limits=limits)
+        self._async_http = httpx.AsyncClient(limits=limits)
+        self.client = genai.Client(
+            api_key=key,
+            http_options=types.HttpOptions(
+                httpx_client=self._http,
+                httpx_async_client=self._async_http,
+            ),
+        )
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+    async def aclose(self) -> None:
+        await self._async_http.aclose()
+        self._http.close()
+
+    async def agenerate_json(
+        self, prompt: str, schema_model: type[ModelT], system_instruction: str | None = None
+    ) -> ModelT:
+        response = await self._acall(
+            lambda: self.client.aio.models.generate_content(
+                model=MODEL_NAME,
+                contents=prompt,
+                config=self._json_config(schema_model, system_instruction),
+            )
+        )
+        return self._parse_json(response, schema_model)
+
+    async def agenerate_json_with_image(
+        self,
+        prompt: str,
+        image_bytes: bytes,
+        schema_model: type[ModelT],
+        system_instruction: str | None = None,
+        mime_type: str = DEFAULT_IMAGE_MIME_TYPE,
+    ) -> ModelT:
+        image_part = self._image_part(image_bytes, mime_type)
+        response = await self._acall(
+            lambda: self.client.aio.models.generate_content(
+                model=MODEL_NAME,
+                contents=[prompt, image_part],
+                config=self._json_config(schema_model, system_instruction),
+            )
+        )
+        return self._parse_json(response, schema_model)
+
+    async def agenerate_text(self, prompt: str) -> str:
+        response = await self._acall(
+            lambda: self.client.aio.models.generate_content(
+                model=MODEL_NAME,
+                contents=prompt,
+                config=self._text_config(),
+            )
+        )
+        _log_usage(response)
+        return response.text or ""
 
     def generate_json(
         self, prompt: str, schema_model: type[ModelT], system_instruction: str | None = None
     ) -> ModelT:
-        schema_dict = schema_model.model_json_schema()
+        _ensure_no_running_loop("generate_json")
         response = self.client.models.generate_content(
             model=MODEL_NAME,
             contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_json_schema=schema_dict,
-                system_instruction=system_instruction,
-                temperature=0.2,
-            ),
+            config=self._json_config(schema_model, system_instruction),
         )
-        raw_text = (response.text or "").strip()
-        try:
-            return schema_model.model_validate_json(raw_text)
-        except Exception as exc:  # pragma: no cover - depends on Gemini response
-            raise ValueError(f"Failed to parse structured output: {raw_text}") from exc
+        return self._parse_json(response, schema_model)
 
     def generate_json_with_image(
         self,
@@ -46,31 +157,89 @@ class GeminiClient:
         image_bytes: bytes,
         schema_model: type[ModelT],
         system_instruction: str | None = None,
+        mime_type: str = DEFAULT_IMAGE_MIME_TYPE,
     ) -> ModelT:
-        schema_dict = schema_model.model_json_schema()
-        image_part = types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
+        _ensure_no_running_loop("generate_json_with_image")
+        image_part = self._image_part(image_bytes, mime_type)
         response = self.client.models.generate_content(
             model=MODEL_NAME,
             contents=[prompt, image_part],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_json_schema=schema_dict,
-                system_instruction=system_instruction,
-                temperature=0.2,
-            ),
+            config=self._json_config(schema_model, system_instruction),
         )
-        raw_text = (response.text or "").strip()
-        try:
-            return schema_model.model_validate_json(raw_text)
-        except Exception as exc:  # pragma: no cover - depends on Gemini response
-            raise ValueError(f"Failed to parse structured output: {raw_text}") from exc
+        return self._parse_json(response, schema_model)
 
     def generate_text(self, prompt: str) -> str:
+        _ensure_no_running_loop("generate_text")
         response = self.client.models.generate_content(
             model=MODEL_NAME,
             contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.4,
-            ),
+            config=self._text_config(),
         )
+        _log_usage(response)
         return response.text or ""
+
+    def _loop_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(_max_concurrency())
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _acall(self, request: Callable[[], Awaitable[ResultT]]) -> ResultT:
+        attempt = 0
+        while True:
+            try:
+                async with self._loop_semaphore():
+                    return await request()
+            except self._errors.ClientError as exc:
+                if exc.code != RATE_LIMIT_STATUS or attempt + 1 >= RETRY_ATTEMPTS:
+                    raise
+            await asyncio.sleep(_backoff_delay(attempt))
+            attempt += 1
+
+    def _image_part(self, image_bytes: bytes, mime_type: str) -> types.Part:
+        key = (hashlib.blake2b(image_bytes, digest_size=16).digest(), mime_type)
+        part = _part_cache.get(key)
+        if part is not None:
+            _part_cache.move_to_end(key)
+            return part
+        part = self._types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+        _part_cache[key] = part
+        if len(_part_cache) > IMAGE_PART_CACHE_SIZE:
+            _part_cache.popitem(last=False)
+        return part
+
+    def _json_config(
+        self, schema_model: type[ModelT], system_instruction: str | None
+    ) -> types.GenerateContentConfig:
+        return self._types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_json_schema=_schema_dict(schema_model),
+            system_instruction=system_instruction,
+            temperature=0.2,
+        )
+
+    def _text_config(self) -> types.GenerateContentConfig:
+        return self._types.GenerateContentConfig(
+            temperature=0.4,
+        )
+
+    @staticmethod
+    def _parse_json(response: Any, schema_model: type[ModelT]) -> ModelT:
+        _log_usage(response)
+        raw_text = (response.text or "").strip()
+        try:
+            return schema_model.model_validate_json(raw_text)
+        except Exception as exc:  # pragma: no cover - depends on Gemini response
+            raise ValueError(f"Failed to parse structured output: {raw_text}") from exc
+
+
+@functools.lru_cache(maxsize=1)
+def get_gemini_client() -> GeminiClient:
+    return GeminiClient()
+
+
+async def aclose_gemini_client() -> None:
+    if get_gemini_client.cache_info().currsize:
+        await get_gemini_client().aclose()
+        get_gemini_client.cache_clear()
@@ -21,3 +21,8 @@ class NLUUpdate(BaseModel):
     defect_evidence_present: bool | None = None
     user_sentiment: str | None = None
     emergency_trigger: bool | None = None
+
+
+class IntentAndClassification(BaseModel):
+    nlu: NLUUpdate
+    classification: ImageClassification
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from shop_agent.gemini_client import MODEL_NAME
+
+
+PROMPT_VERSION = "v1"
+PROVIDER = "gemini"
+CACHE_TTL_SECONDS = 3600.0
+MEMORY_ENTRIES = 512
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "mmap_size=268435456",
+)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _cache_path() -> str:
+    return os.getenv("NLU_CACHE_PATH", "./llm_cache.db")
+
+
+def cache_key(
+    kind: str, user_message: str, image_bytes: bytes | None = None, model: str = MODEL_NAME
+) -> bytes:
+    fields = [PROMPT_VERSION.encode(), model.encode(), kind.encode(), user_message.encode("utf-8")]
+    if image_bytes is not None:
+        fields.append(image_bytes)
+    digest = hashlib.sha256()
+    for field in fields:
+        digest.update(struct.pack("<Q", len(field)))
+        digest.update(field)
+    return digest.digest()
+
+
+class NLUCache:
+    def __init__(
+        self,
+        path: str | None = None,
+        ttl: float = CACHE_TTL_SECONDS,
+        memory_entries: int = MEMORY_ENTRIES,
+    ):
+        self.path = path or _cache_path()
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict[bytes, tuple[float, BaseModel]] = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+
+    def peek(self, key: bytes, schema_model: type[ModelT]) -> Optional[ModelT]:
+        now = time.time()
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] < self.ttl and isinstance(entry[1], schema_model):
+                self._memory.move_to_end(key)
+                return entry[1]
+            del self._memory[key]
+        return None
+
+    def get(self, key: bytes, schema_model: type[ModelT]) -> Optional[ModelT]:
+        result = self.peek(key, schema_model)
+        if result is not None:
+            return result
+        now = time.time()
+        try:
+            row = self._reader().execute(
+                "SELECT payload, created_at FROM llm_cache WHERE hash = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        if now - row[1] >= self.ttl:
+            self._write("DELETE FROM llm_cache WHERE hash = ?", (key,))
+            return None
+        try:
+            result = schema_model.model_validate_json(row[0])
+        except ValidationError:
+            self._write("DELETE FROM llm_cache WHERE hash = ?", (key,))
+            return None
+        self._remember(key, row[1], result)
+        return result
+
+    def set(self, key: bytes, result: BaseModel) -> None:
+        created_at = time.time()
+        self._remember(key, created_at, result)
+        self._write(
+            "INSERT OR REPLACE INTO llm_cache"
+            " (hash, provider, model, prompt_version, payload, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, PROVIDER, MODEL_NAME, PROMPT_VERSION, result.model_dump_json(), created_at),
+        )
+
+    def _remember(self, key: bytes, created_at: float, result: BaseModel) -> None:
+        with self._memory_lock:
+            self._memory[key] = (created_at, result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _write(self, statement: str, params: tuple) -> None:
+        try:
+            with self._write_lock:
+                if self._writer is None:
+                    self._writer = self._connect()
+                self._writer.execute(statement, params)
+                self._writer.commit()
+        except sqlite3.Error:
+            return
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(f"PRAGMA {pragma}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "hash BLOB PRIMARY KEY, provider TEXT, model TEXT, prompt_version TEXT, "
+            "payload TEXT, created_at REAL)"
+        )
+        return conn
+
+
+@functools.lru_cache(maxsize=1)
+def get_nlu_cache() -> NLUCache:
+    return NLUCache()
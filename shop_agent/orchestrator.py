@@ -1,22 +1,29 @@
 from __future__ import annotations
 
-import json
-import random
+import asyncio
+import io
 import re
-from datetime import datetime
-from typing import Optional
+import secrets
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional, TypeVar
 
-from shop_agent.gemini_client import GeminiClient
-from shop_agent.models import ImageClassification, NLUUpdate
+import orjson
+
+from shop_agent.gemini_client import DEFAULT_IMAGE_MIME_TYPE, GeminiClient
+from shop_agent.models import ImageClassification, IntentAndClassification, NLUUpdate
+from shop_agent.nlu_cache import NLUCache, cache_key
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from pydantic import BaseModel
+
     from shop_agent.db import Case
 
 
-CATEGORIES = {"FOOD", "FURNITURE", "ELECTRONICS", "ART"}
-INTENTS = {"WANT_REFUND", "ARRIVED_BROKEN", "DID_NOT_LIKE"}
+CATEGORIES = frozenset({"FOOD", "FURNITURE", "ELECTRONICS", "ART"})
+INTENTS = frozenset({"WANT_REFUND", "ARRIVED_BROKEN", "DID_NOT_LIKE"})
 SYSTEM_INSTRUCTION = (
     "You are a structured-data extractor for a retail returns agent. "
     "Return JSON only that matches the provided schema. "
@@ -24,118 +31,463 @@ SYSTEM_INSTRUCTION = (
     "Categories are FOOD, FURNITURE, ELECTRONICS, ART. "
     "Intents are WANT_REFUND, ARRIVED_BROKEN, DID_NOT_LIKE."
 )
+_CLASSIFY_PROMPT_PREFIX = (
+    "You are a product classifier. "
+    "Return JSON only. "
+    "Classify into FOOD, FURNITURE, ELECTRONICS, ART. "
+    "If unsure set needs_clarification=true and confidence below 0.70. "
+    "User message: "
+)
+_NLU_PROMPT_PREFIX = (
+    "You are extracting structured facts for a retail agent. "
+    "Return JSON only. "
+    "Extract category, intent, requested_action, days_since_purchase, "
+    "purchase_date_iso, furniture_assembled, electronics_defect_claimed, "
+    "defect_evidence_present, user_sentiment, emergency_trigger. "
+    "User message: "
+)
+_COMBINED_PROMPT_PREFIX = (
+    "You are classifying a product photo and extracting structured facts for a retail agent. "
+    "Return JSON only with two objects. "
+    "In classification, classify the pictured product into FOOD, FURNITURE, ELECTRONICS, ART; "
+    "if unsure set needs_clarification=true and confidence below 0.70. "
+    "In nlu, extract category, intent, requested_action, days_since_purchase, "
+    "purchase_date_iso, furniture_assembled, electronics_defect_claimed, "
+    "defect_evidence_present, user_sentiment, emergency_trigger from the user message. "
+    "User message: "
+)
+
+
+_NLU_ASSIGNMENTS = (
+    ("category", "in_set", CATEGORIES),
+    ("requested_action", "truthy", None),
+    ("purchase_date_iso", "truthy", None),
+    ("furniture_assembled", "notnone", None),
+    ("electronics_defect_claimed", "notnone", None),
+    ("defect_evidence_present", "notnone", None),
+    ("user_sentiment", "truthy", None),
+    ("emergency_trigger", "notnone", None),
+)
+
+_SLOT_BITS = {
+    "category": 1 << 0,
+    "intent": 1 << 1,
+    "days_since_purchase": 1 << 2,
+    "furniture_assembled": 1 << 3,
+    "electronics_defect_claimed": 1 << 4,
+    "defect_evidence_present": 1 << 5,
+    "customer_name": 1 << 6,
+    "pickup_address_json": 1 << 7,
+    "customer_phone": 1 << 8,
+}
+
+_SLOT_QUESTIONS: Mapping[str, str] = MappingProxyType(
+    {
+        "category": "What category is the product (FOOD, FURNITURE, ELECTRONICS, ART)?",
+        "intent": "Is the issue a refund request, arrived broken, or did not like it?",
+        "days_since_purchase": "How many days since purchase?",
+        "furniture_assembled": "Was the furniture assembled? (yes/no)",
+        "electronics_defect_claimed": "Is it defective/broken, or did you change your mind?",
+        "defect_evidence_present": "Do you have evidence of the defect (image/video or clear symptoms)?",
+        "customer_name": "Please provide your full name.",
+        "pickup_address_json": "Please provide your pickup address (city, street, house, apt).",
+        "customer_phone": "Please provide your phone number.",
+    }
+)
+_SLOT_LABELS: Mapping[str, str] = MappingProxyType(
+    {
+        "category": "product category",
+        "intent": "issue type (refund, arrived broken, did not like)",
+        "days_since_purchase": "days since purchase",
+        "furniture_assembled": "whether the furniture was assembled",
+        "electronics_defect_claimed": "whether it is defective",
+        "defect_evidence_present": "defect evidence details",
+        "customer_name": "full name",
+        "pickup_address_json": "pickup address",
+        "customer_phone": "phone number",
+    }
+)
+
+_DATA_COLLECTION_SLOTS = ("customer_name", "pickup_address_json", "customer_phone")
+
+_MAX_RETENTION_DISCOUNT = 20.0
+_RETENTION_DISCOUNTS: Mapping[int, float] = MappingProxyType({1: 0.0, 2: 6.0, 3: 11.0})
+_FINAL_RETENTION_REPLY = (
+    f"Given the situation, I can offer a {_MAX_RETENTION_DISCOUNT:.0f}% coupon as a final option."
+)
+_RETENTION_REPLIES: Mapping[int, str] = MappingProxyType(
+    {
+        1: "I’m sorry this didn’t work out. While returns aren’t available, I can assist further.",
+        2: "I can offer a 6% goodwill coupon to help.",
+        3: "I checked with my manager and can offer an 11% coupon.",
+    }
+)
+
+_DIGITS_RE = re.compile(r"(\d+)")
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}", re.ASCII)
+_WORD_RE = re.compile(r"\w+")
+_FILLER_MESSAGES = frozenset(
+    {
+        "ok",
+        "okay",
+        "k",
+        "thanks",
+        "thank you",
+        "thx",
+        "hi",
+        "hello",
+        "hey",
+        "help",
+        "hmm",
+        "спасибо",
+        "привет",
+    }
+)
+_YES_RE = re.compile(r"\b(yes|да|yep)\b", re.I)
+_NO_RE = re.compile(r"\b(no|нет|nope)\b", re.I)
+_EMERGENCY_TRIGGERS = frozenset({"lawsuit", "sue", "reviews", "consumer protection", "роспотребнадзор"})
+_DEFECT_CLAIM_MAP = (
+    ("defective", True),
+    ("broken", True),
+    ("doesn't work", True),
+    ("changed my mind", False),
+    ("don't like", False),
+)
+_INTENT_MAP = (
+    ("broken", "ARRIVED_BROKEN"),
+    ("defective", "ARRIVED_BROKEN"),
+    ("refund", "WANT_REFUND"),
+    ("not like", "DID_NOT_LIKE"),
+    ("changed my mind", "DID_NOT_LIKE"),
+)
+_CATEGORY_MAP = (
+    ("food", "FOOD"),
+    ("furniture", "FURNITURE"),
+    ("table", "FURNITURE"),
+    ("chair", "FURNITURE"),
+    ("electronic", "ELECTRONICS"),
+    ("laptop", "ELECTRONICS"),
+    ("phone", "ELECTRONICS"),
+    ("art", "ART"),
+    ("painting", "ART"),
+)
+
+
+MAX_IMAGE_SIDE = 1024
+MAX_IMAGE_PIXELS = 40_000_000
+JPEG_QUALITY = 82
+
+ModelT = TypeVar("ModelT")
+
+
+def _add_slot(missing: list[str], missing_unasked: list[str], skip_mask: int, slot: str) -> None:
+    missing.append(slot)
+    if not skip_mask & _SLOT_BITS[slot]:
+        missing_unasked.append(slot)
+
+
+def _downscale_image(image_bytes: bytes, mime_type: str | None) -> tuple[bytes, str | None]:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return image_bytes, mime_type
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            if image.width * image.height > MAX_IMAGE_PIXELS:
+                return image_bytes, mime_type
+            if max(image.size) <= MAX_IMAGE_SIDE and mime_type == "image/jpeg":
+                return image_bytes, mime_type
+            image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.LANCZOS)
+            image = ImageOps.exif_transpose(image)
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return image_bytes, mime_type
+    if buffer.tell() >= len(image_bytes):
+        return image_bytes, mime_type
+    return buffer.getvalue(), "image/jpeg"
 
 
 class DialogManager:
-    def __init__(self, gemini: GeminiClient):
+    __slots__ = ("gemini", "cache")
+
+    def __init__(self, gemini: GeminiClient, cache: NLUCache | None = None):
         self.gemini = gemini
+        self.cache = cache
 
     def handle_turn(
-        self, case: "Case", user_message: str, image_bytes: bytes | None = None
+        self,
+        case: "Case",
+        user_message: str,
+        image_bytes: bytes | None = None,
+        image_mime_type: str | None = None,
+    ) -> tuple[str, str | None, str | None]:
+        run_nlu = self._begin_turn(case, user_message)
+        if image_bytes and run_nlu:
+            self._update_combined(case, user_message, image_bytes, image_mime_type)
+        elif image_bytes:
+            self._update_classification(case, user_message, image_bytes, image_mime_type)
+        elif run_nlu:
+            self._update_nlu(case, user_message)
+        return self._finish_turn(case, datetime.now(timezone.utc))
+
+    async def ahandle_turn(
+        self,
+        case: "Case",
+        user_message: str,
+        image_bytes: bytes | None = None,
+        image_mime_type: str | None = None,
     ) -> tuple[str, str | None, str | None]:
+        run_nlu = self._begin_turn(case, user_message)
+        await self._aextract(case, user_message, image_bytes, image_mime_type, run_nlu)
+        return self._finish_turn(case, datetime.now(timezone.utc))
+
+    async def _aextract(
+        self,
+        case: "Case",
+        user_message: str,
+        image_bytes: bytes | None,
+        image_mime_type: str | None,
+        run_nlu: bool,
+    ) -> None:
+        if image_bytes and run_nlu:
+            self._apply_combined(
+                case, await self._request_combined(user_message, image_bytes, image_mime_type)
+            )
+        elif image_bytes:
+            self._apply_classification(
+                case,
+                await self._request_classification(user_message, image_bytes, image_mime_type),
+            )
+        elif run_nlu:
+            self._apply_nlu(case, await self._request_nlu(user_message))
+
+    def _begin_turn(self, case: "Case", user_message: str) -> bool:
         case.turn_count = (case.turn_count or 0) + 1
         if self._detect_emergency(user_message):
             case.emergency_trigger = True
-        self._apply_followup_parser(case, user_message)
-        if image_bytes:
-            self._update_classification(case, user_message, image_bytes)
-        if self._should_run_nlu(case):
-            self._update_nlu(case, user_message)
-        missing_slots = self._missing_slots(case)
-        missing_unasked = [slot for slot in missing_slots if slot not in self._asked_slots(case)]
-        if case.turn_count >= 8 and missing_slots:
+            self._recompute_nlu_complete(case)
+        if case.last_question_slot and self._apply_followup_parser(case, user_message):
+            self._recompute_nlu_complete(case)
+            if self._looks_bare_value(user_message):
+                return False
+        if self._is_filler(user_message):
+            return False
+        return self._should_run_nlu(case)
+
+    def _finish_turn(self, case: "Case", now: datetime) -> tuple[str, str | None, str | None]:
+        out_of_turns = case.turn_count >= 8
+        missing_slots, missing_unasked, first_missing = self._compute_slots(
+            case, self._asked_mask(case), want_unasked=not out_of_turns
+        )
+        if out_of_turns and missing_slots:
             reply = self._fallback_reply(case, missing_slots)
-            return reply, case.status, missing_slots[0]
+            return reply, case.status, first_missing
         if missing_unasked:
             reply = self._ask_next(case, missing_unasked)
             return reply, case.status, missing_unasked[0]
         if missing_slots:
-            return "Thanks. I can proceed once the remaining detail is provided.", case.status, missing_slots[0]
-        decision = self._decision_tree(case)
+            return "Thanks. I can proceed once the remaining detail is provided.", case.status, first_missing
+        decision = self._decision_tree(case, now)
         reply = self._build_decision_reply(case, decision)
         return reply, case.status, None
 
-    def _update_classification(self, case: "Case", user_message: str, image_bytes: bytes) -> None:
-        prompt = (
-            "You are a product classifier. "
-            "Return JSON only. "
-            "Classify into FOOD, FURNITURE, ELECTRONICS, ART. "
-            "If unsure set needs_clarification=true and confidence below 0.70. "
-            f"User message: {user_message}"
-        )
-        result = self.gemini.generate_json_with_image(
-            prompt, image_bytes, ImageClassification, system_instruction=SYSTEM_INSTRUCTION
+    def _update_classification(
+        self,
+        case: "Case",
+        user_message: str,
+        image_bytes: bytes,
+        mime_type: str | None = None,
+    ) -> None:
+        key, result = self._cache_lookup(ImageClassification, user_message, image_bytes)
+        if result is None:
+            image_bytes, mime_type = _downscale_image(image_bytes, mime_type)
+            result = self.gemini.generate_json_with_image(
+                self._classification_prompt(user_message),
+                image_bytes,
+                ImageClassification,
+                system_instruction=SYSTEM_INSTRUCTION,
+                mime_type=mime_type or DEFAULT_IMAGE_MIME_TYPE,
+            )
+            self._cache_store(key, result)
+        self._apply_classification(case, result)
+
+    async def _request_classification(
+        self, user_message: str, image_bytes: bytes, mime_type: str | None = None
+    ) -> ImageClassification:
+        key, result = await self._acache_lookup(ImageClassification, user_message, image_bytes)
+        if result is not None:
+            return result
+        image_bytes, mime_type = await asyncio.to_thread(_downscale_image, image_bytes, mime_type)
+        result = await self.gemini.agenerate_json_with_image(
+            self._classification_prompt(user_message),
+            image_bytes,
+            ImageClassification,
+            system_instruction=SYSTEM_INSTRUCTION,
+            mime_type=mime_type or DEFAULT_IMAGE_MIME_TYPE,
         )
+        await self._acache_store(key, result)
+        return result
+
+    @staticmethod
+    def _classification_prompt(user_message: str) -> str:
+        return _CLASSIFY_PROMPT_PREFIX + user_message
+
+    def _apply_classification(self, case: "Case", result: ImageClassification) -> None:
         if result.needs_clarification or result.confidence < 0.70:
             return
         if result.category in CATEGORIES:
             case.category = result.category
+            self._recompute_nlu_complete(case)
+
+    def _update_combined(
+        self,
+        case: "Case",
+        user_message: str,
+        image_bytes: bytes,
+        mime_type: str | None = None,
+    ) -> None:
+        key, result = self._cache_lookup(IntentAndClassification, user_message, image_bytes)
+        if result is None:
+            image_bytes, mime_type = _downscale_image(image_bytes, mime_type)
+            result = self.gemini.generate_json_with_image(
+                self._combined_prompt(user_message),
+                image_bytes,
+                IntentAndClassification,
+                system_instruction=SYSTEM_INSTRUCTION,
+                mime_type=mime_type or DEFAULT_IMAGE_MIME_TYPE,
+            )
+            self._cache_store(key, result)
+        self._apply_combined(case, result)
+
+    async def _request_combined(
+        self, user_message: str, image_bytes: bytes, mime_type: str | None = None
+    ) -> IntentAndClassification:
+        key, result = await self._acache_lookup(IntentAndClassification, user_message, image_bytes)
+        if result is not None:
+            return result
+        image_bytes, mime_type = await asyncio.to_thread(_downscale_image, image_bytes, mime_type)
+        result = await self.gemini.agenerate_json_with_image(
+            self._combined_prompt(user_message),
+            image_bytes,
+            IntentAndClassification,
+            system_instruction=SYSTEM_INSTRUCTION,
+            mime_type=mime_type or DEFAULT_IMAGE_MIME_TYPE,
+        )
+        await self._acache_store(key, result)
+        return result
+
+    @staticmethod
+    def _combined_prompt(user_message: str) -> str:
+        return _COMBINED_PROMPT_PREFIX + user_message
+
+    def _apply_combined(self, case: "Case", result: IntentAndClassification) -> None:
+        self._apply_classification(case, result.classification)
+        self._apply_nlu(case, result.nlu)
 
     def _update_nlu(self, case: "Case", user_message: str) -> None:
-        prompt = (
-            "You are extracting structured facts for a retail agent. "
-            "Return JSON only. "
-            "Extract category, intent, requested_action, days_since_purchase, "
-            "purchase_date_iso, furniture_assembled, electronics_defect_claimed, "
-            "defect_evidence_present, user_sentiment, emergency_trigger. "
-            f"User message: {user_message}"
+        key, result = self._cache_lookup(NLUUpdate, user_message)
+        if result is None:
+            result = self.gemini.generate_json(
+                self._nlu_prompt(user_message), NLUUpdate, system_instruction=SYSTEM_INSTRUCTION
+            )
+            self._cache_store(key, result)
+        self._apply_nlu(case, result)
+
+    async def _request_nlu(self, user_message: str) -> NLUUpdate:
+        key, result = await self._acache_lookup(NLUUpdate, user_message)
+        if result is not None:
+            return result
+        result = await self.gemini.agenerate_json(
+            self._nlu_prompt(user_message), NLUUpdate, system_instruction=SYSTEM_INSTRUCTION
         )
-        result = self.gemini.generate_json(
-            prompt, NLUUpdate, system_instruction=SYSTEM_INSTRUCTION
-        )
-        if result.category in CATEGORIES:
-            case.category = result.category
+        await self._acache_store(key, result)
+        return result
+
+    @staticmethod
+    def _nlu_prompt(user_message: str) -> str:
+        return _NLU_PROMPT_PREFIX + user_message
+
+    def _cache_lookup(
+        self, schema_model: type[ModelT], user_message: str, image_bytes: bytes | None = None
+    ) -> tuple[bytes | None, Optional[ModelT]]:
+        if self.cache is None:
+            return None, None
+        key = cache_key(schema_model.__name__, user_message, image_bytes)
+        return key, self.cache.get(key, schema_model)
+
+    def _cache_store(self, key: bytes | None, result: "BaseModel") -> None:
+        if self.cache is not None and key is not None:
+            self.cache.set(key, result)
+
+    async def _acache_lookup(
+        self, schema_model: type[ModelT], user_message: str, image_bytes: bytes | None = None
+    ) -> tuple[bytes | None, Optional[ModelT]]:
+        if self.cache is None:
+            return None, None
+        key = cache_key(schema_model.__name__, user_message, image_bytes)
+        result = self.cache.peek(key, schema_model)
+        if result is None:
+            result = await asyncio.to_thread(self.cache.get, key, schema_model)
+        return key, result
+
+    async def _acache_store(self, key: bytes | None, result: "BaseModel") -> None:
+        if self.cache is not None and key is not None:
+            await asyncio.to_thread(self.cache.set, key, result)
+
+    def _apply_nlu(self, case: "Case", result: NLUUpdate) -> None:
         if result.intent in INTENTS:
             case.intent = result.intent
             if result.intent == "ARRIVED_BROKEN":
                 case.electronics_defect_claimed = True
             if result.intent == "DID_NOT_LIKE":
                 case.electronics_defect_claimed = False
-        if result.requested_action:
-            case.requested_action = result.requested_action
         if result.days_since_purchase is not None:
             case.days_since_purchase = int(result.days_since_purchase)
-        if result.purchase_date_iso:
-            case.purchase_date_iso = result.purchase_date_iso
-        if result.furniture_assembled is not None:
-            case.furniture_assembled = result.furniture_assembled
-        if result.electronics_defect_claimed is not None:
-            case.electronics_defect_claimed = result.electronics_defect_claimed
-        if result.defect_evidence_present is not None:
-            case.defect_evidence_present = result.defect_evidence_present
-        if result.user_sentiment:
-            case.user_sentiment = result.user_sentiment
-        if result.emergency_trigger is not None:
-            case.emergency_trigger = result.emergency_trigger
-
-    def _missing_slots(self, case: "Case") -> list[str]:
-        missing = []
+        for name, kind, allowed in _NLU_ASSIGNMENTS:
+            value = getattr(result, name)
+            if kind == "notnone":
+                if value is not None:
+                    setattr(case, name, value)
+            elif kind == "truthy":
+                if value:
+                    setattr(case, name, value)
+            elif value in allowed:
+                setattr(case, name, value)
+        self._recompute_nlu_complete(case)
+
+    def _compute_slots(
+        self, case: "Case", asked_mask: int, want_unasked: bool = True
+    ) -> tuple[list[str], list[str], Optional[str]]:
+        missing: list[str] = []
+        missing_unasked: list[str] = []
+        skip_mask = asked_mask if want_unasked else -1
         if not case.category:
-            missing.append("category")
+            _add_slot(missing, missing_unasked, skip_mask, "category")
         if not case.intent:
-            missing.append("intent")
+            _add_slot(missing, missing_unasked, skip_mask, "intent")
         if case.category == "FURNITURE":
             if case.days_since_purchase is None and not case.purchase_date_iso:
-                missing.append("days_since_purchase")
+                _add_slot(missing, missing_unasked, skip_mask, "days_since_purchase")
             if case.days_since_purchase is not None and case.days_since_purchase <= 7:
                 if case.furniture_assembled is None:
-                    missing.append("furniture_assembled")
-        if case.category == "ELECTRONICS":
+                    _add_slot(missing, missing_unasked, skip_mask, "furniture_assembled")
+        elif case.category == "ELECTRONICS":
             if case.electronics_defect_claimed is None:
-                missing.append("electronics_defect_claimed")
+                _add_slot(missing, missing_unasked, skip_mask, "electronics_defect_claimed")
             elif case.electronics_defect_claimed:
                 if case.defect_evidence_present is None:
-                    missing.append("defect_evidence_present")
-        if case.category in {"ART"}:
+                    _add_slot(missing, missing_unasked, skip_mask, "defect_evidence_present")
+        elif case.category == "ART":
             if not case.customer_name:
-                missing.append("customer_name")
+                _add_slot(missing, missing_unasked, skip_mask, "customer_name")
             if not case.pickup_address_json:
-                missing.append("pickup_address_json")
+                _add_slot(missing, missing_unasked, skip_mask, "pickup_address_json")
             if not case.customer_phone:
-                missing.append("customer_phone")
-        return missing
+                _add_slot(missing, missing_unasked, skip_mask, "customer_phone")
+        return missing, missing_unasked, missing[0] if missing else None
 
-    def _decision_tree(self, case: "Case") -> dict:
+    def _decision_tree(self, case: "Case", now: datetime) -> dict:
         if case.category == "FOOD":
             return self._retention(case, "Returns are not available for food items.")
         if case.category == "ART":
@@ -151,7 +503,7 @@ class DialogManager:
                 }
             return self._approve(case, "Defect confirmed for electronics.")
         if case.category == "FURNITURE":
-            days = case.days_since_purchase or self._days_from_date(case.purchase_date_iso)
+            days = case.days_since_purchase or self._days_from_date(case.purchase_date_iso, now)
             if days is None:
                 case.status = "needs_info"
                 return {"decision": "needs_info", "reason": "Need purchase timing."}
@@ -182,13 +534,7 @@ class DialogManager:
         return {"decision": "retention", "reason": reason, "step": step}
 
     def _retention_discount(self, step: int) -> float:
-        if step == 1:
-            return 0.0
-        if step == 2:
-            return 6.0
-        if step == 3:
-            return 11.0
-        return 20.0
+        return _RETENTION_DISCOUNTS.get(step, _MAX_RETENTION_DISCOUNT)
 
     def _build_decision_reply(self, case: "Case", decision: dict) -> str:
         if decision["decision"] == "approved":
@@ -200,56 +546,25 @@ class DialogManager:
         return "Thanks. Let me review your case."
 
     def _data_collection_reply(self, case: "Case") -> str:
-        if not case.customer_name:
-            self._mark_asked(case, "customer_name")
-            case.last_question_slot = "customer_name"
-            return "Please provide your full name."
-        if not case.pickup_address_json:
-            self._mark_asked(case, "pickup_address_json")
-            case.last_question_slot = "pickup_address_json"
-            return "Please provide your pickup address (city, street, house, apt)."
-        if not case.customer_phone:
-            self._mark_asked(case, "customer_phone")
-            case.last_question_slot = "customer_phone"
-            return "Please provide your phone number."
+        for slot in _DATA_COLLECTION_SLOTS:
+            if not getattr(case, slot):
+                self._mark_asked(case, slot)
+                case.last_question_slot = slot
+                return _SLOT_QUESTIONS[slot]
         if not case.ticket_number:
-            case.ticket_number = f"{random.randint(0, 99999999):08d}"
+            case.ticket_number = f"{secrets.randbelow(100_000_000):08d}"
         return f"Request #{case.ticket_number} created. Courier will contact you."
 
     def _retention_reply(self, case: "Case") -> str:
         step = case.retention_step or 1
-        if step == 1:
-            return "I’m sorry this didn’t work out. While returns aren’t available, I can assist further."
-        if step == 2:
-            return "I can offer a 6% goodwill coupon to help."
-        if step == 3:
-            return "I checked with my manager and can offer an 11% coupon."
-        return "Given the situation, I can offer a 20% coupon as a final option."
+        return _RETENTION_REPLIES.get(step, _FINAL_RETENTION_REPLY)
 
     def _ask_next(self, case: "Case", missing: list[str]) -> str:
         slot = missing[0]
         self._mark_asked(case, slot)
         case.last_question_slot = slot
         case.status = "needs_info"
-        if slot == "category":
-            return "What category is the product (FOOD, FURNITURE, ELECTRONICS, ART)?"
-        if slot == "intent":
-            return "Is the issue a refund request, arrived broken, or did not like it?"
-        if slot == "days_since_purchase":
-            return "How many days since purchase?"
-        if slot == "furniture_assembled":
-            return "Was the furniture assembled? (yes/no)"
-        if slot == "electronics_defect_claimed":
-            return "Is it defective/broken, or did you change your mind?"
-        if slot == "defect_evidence_present":
-            return "Do you have evidence of the defect (image/video or clear symptoms)?"
-        if slot == "customer_name":
-            return "Please provide your full name."
-        if slot == "pickup_address_json":
-            return "Please provide your pickup address (city, street, house, apt)."
-        if slot == "customer_phone":
-            return "Please provide your phone number."
-        return "Could you provide the missing detail?"
+        return _SLOT_QUESTIONS.get(slot, "Could you provide the missing detail?")
 
     def _fallback_reply(self, case: "Case", missing: list[str]) -> str:
         slot = missing[0]
@@ -257,111 +572,79 @@ class DialogManager:
         return f"{summary} I need one more detail: {self._slot_label(slot)}."
 
     def _slot_label(self, slot: str) -> str:
-        labels = {
-            "category": "product category",
-            "intent": "issue type (refund, arrived broken, did not like)",
-            "days_since_purchase": "days since purchase",
-            "furniture_assembled": "whether the furniture was assembled",
-            "electronics_defect_claimed": "whether it is defective",
-            "defect_evidence_present": "defect evidence details",
-            "customer_name": "full name",
-            "pickup_address_json": "pickup address",
-            "customer_phone": "phone number",
-        }
-        return labels.get(slot, "missing detail")
-
-    def _apply_followup_parser(self, case: "Case", user_message: str) -> None:
-        if not case.last_question_slot:
-            return
+        return _SLOT_LABELS.get(slot, "missing detail")
+
+    def _apply_followup_parser(self, case: "Case", user_message: str) -> bool:
         slot = case.last_question_slot
-        if slot == "days_since_purchase":
-            value = self._parse_days(user_message)
-            if value is not None:
-                case.days_since_purchase = value
-                case.last_question_slot = None
-        elif slot == "furniture_assembled":
-            value = self._parse_yes_no(user_message)
-            if value is not None:
-                case.furniture_assembled = value
-                case.last_question_slot = None
-        elif slot == "electronics_defect_claimed":
-            value = self._parse_defect_claim(user_message)
-            if value is not None:
-                case.electronics_defect_claimed = value
-                case.last_question_slot = None
-        elif slot == "defect_evidence_present":
-            value = self._parse_yes_no(user_message)
-            if value is not None:
-                case.defect_evidence_present = value
-                case.last_question_slot = None
-        elif slot == "customer_name":
-            if len(user_message.strip().split()) >= 2:
-                case.customer_name = user_message.strip()
-                case.last_question_slot = None
-        elif slot == "customer_phone":
-            phone = self._parse_phone(user_message)
-            if phone:
-                case.customer_phone = phone
-                case.last_question_slot = None
-        elif slot == "pickup_address_json":
-            address = self._parse_address(user_message)
-            if address:
-                case.pickup_address_json = address
-                case.last_question_slot = None
-        elif slot == "intent":
-            intent = self._parse_intent(user_message)
-            if intent:
-                case.intent = intent
-                case.last_question_slot = None
-        elif slot == "category":
-            category = self._parse_category(user_message)
-            if category:
-                case.category = category
-                case.last_question_slot = None
-
-    def _asked_slots(self, case: "Case") -> list[str]:
-        if not case.asked_slots:
-            return []
-        try:
-            return json.loads(case.asked_slots)
-        except json.JSONDecodeError:
-            return []
+        parser = _FOLLOWUP_PARSERS.get(slot)
+        if parser is None:
+            return False
+        value = parser(user_message)
+        if value is None:
+            return False
+        setattr(case, slot, value)
+        case.last_question_slot = None
+        return True
+
+    def _asked_mask(self, case: "Case") -> int:
+        if case.asked_slots_mask is None:
+            case.asked_slots_mask = self._legacy_asked_mask(case.asked_slots)
+        return case.asked_slots_mask
 
     def _mark_asked(self, case: "Case", slot: str) -> None:
-        asked = self._asked_slots(case)
-        if slot not in asked:
-            asked.append(slot)
-        case.asked_slots = json.dumps(asked)
+        case.asked_slots_mask = self._asked_mask(case) | _SLOT_BITS[slot]
+
+    @staticmethod
+    def _legacy_asked_mask(asked_slots: str | None) -> int:
+        if not asked_slots:
+            return 0
+        try:
+            slots = orjson.loads(asked_slots)
+        except orjson.JSONDecodeError:
+            return 0
+        mask = 0
+        for slot in slots:
+            mask |= _SLOT_BITS.get(slot, 0)
+        return mask
 
     def _should_run_nlu(self, case: "Case") -> bool:
-        return any(
-            field is None
-            for field in [
-                case.category,
-                case.intent,
-                case.days_since_purchase,
-                case.purchase_date_iso,
-                case.furniture_assembled,
-                case.electronics_defect_claimed,
-                case.defect_evidence_present,
-                case.emergency_trigger,
-            ]
+        return not case.nlu_complete
+
+    def _recompute_nlu_complete(self, case: "Case") -> None:
+        case.nlu_complete = (
+            case.category is not None
+            and case.intent is not None
+            and case.days_since_purchase is not None
+            and case.purchase_date_iso is not None
+            and case.furniture_assembled is not None
+            and case.electronics_defect_claimed is not None
+            and case.defect_evidence_present is not None
+            and case.emergency_trigger is not None
         )
 
+    @staticmethod
+    def _is_filler(message: str) -> bool:
+        words = _WORD_RE.findall(message.lower())
+        return not words or " ".join(words) in _FILLER_MESSAGES
+
+    @staticmethod
+    def _looks_bare_value(message: str) -> bool:
+        return len(message) < 24 or len(message.split()) < 4
+
     @staticmethod
     def _parse_days(message: str) -> Optional[int]:
-        match = re.search(r"(\d+)", message)
+        match = _DIGITS_RE.search(message)
         if not match:
             return None
         return int(match.group(1))
 
     @staticmethod
     def _parse_yes_no(message: str) -> Optional[bool]:
-        text = message.lower()
-        if any(token in text for token in ["yes", "да", "yep"]):
+        if _YES_RE.search(message):
             return True
-        if any(token in text for token in ["no", "нет", "nope"]):
+        if _NO_RE.search(message):
             return False
+        text = message.lower()
         if "unassembled" in text or "not assembled" in text:
             return False
         if "assembled" in text:
@@ -371,39 +654,37 @@ class DialogManager:
     @staticmethod
     def _parse_defect_claim(message: str) -> Optional[bool]:
         text = message.lower()
-        if "defective" in text or "broken" in text or "doesn't work" in text:
-            return True
-        if "changed my mind" in text or "don't like" in text:
-            return False
+        for token, claimed in _DEFECT_CLAIM_MAP:
+            if token in text:
+                return claimed
         return None
 
     @staticmethod
     def _parse_intent(message: str) -> Optional[str]:
         text = message.lower()
-        if "broken" in text or "defective" in text:
-            return "ARRIVED_BROKEN"
-        if "refund" in text:
-            return "WANT_REFUND"
-        if "not like" in text or "changed my mind" in text:
-            return "DID_NOT_LIKE"
+        for token, intent in _INTENT_MAP:
+            if token in text:
+                return intent
         return None
 
     @staticmethod
     def _parse_category(message: str) -> Optional[str]:
         text = message.lower()
-        if "food" in text:
-            return "FOOD"
-        if "furniture" in text or "table" in text or "chair" in text:
-            return "FURNITURE"
-        if "electronic" in text or "laptop" in text or "phone" in text:
-            return "ELECTRONICS"
-        if "art" in text or "painting" in text:
-            return "ART"
+        for token, category in _CATEGORY_MAP:
+            if token in text:
+                return category
+        return None
+
+    @staticmethod
+    def _parse_name(message: str) -> Optional[str]:
+        name = message.strip()
+        if len(name.split()) >= 2:
+            return name
         return None
 
     @staticmethod
     def _parse_phone(message: str) -> Optional[str]:
-        digits = re.sub(r"\D", "", message)
+        digits = "".join(filter(str.isdecimal, message))
         if len(digits) >= 10:
             return digits
         return None
@@ -416,20 +697,42 @@ class DialogManager:
         return {"raw": message.strip(), "parts": parts}
 
     @staticmethod
-    def _days_from_date(date_iso: str | None) -> Optional[int]:
+    def _days_from_date(date_iso: str | None, now: datetime) -> Optional[int]:
         if not date_iso:
             return None
         try:
-            parsed = datetime.fromisoformat(date_iso)
+            if _ISO_DATE_RE.fullmatch(date_iso):
+                parsed = datetime(int(date_iso[0:4]), int(date_iso[5:7]), int(date_iso[8:10]))
+            else:
+                parsed = datetime.fromisoformat(date_iso)
         except ValueError:
             return None
-        return (datetime.utcnow() - parsed).days
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return (now - parsed).days
 
     @staticmethod
     def _detect_emergency(message: str) -> bool:
         text = message.strip()
-        if text.isupper() and len(text) > 8:
+        if not text:
+            return False
+        if len(text) > 8 and text.isupper():
             return True
-        triggers = ["lawsuit", "sue", "reviews", "consumer protection", "роспотребнадзор"]
         lowered = text.lower()
-        return any(trigger in lowered for trigger in triggers)
+        for trigger in _EMERGENCY_TRIGGERS:
+            if trigger in lowered:
+                return True
+        return False
+
+
+_FOLLOWUP_PARSERS: dict[str, Callable[[str], Any]] = {
+    "days_since_purchase": DialogManager._parse_days,
+    "furniture_assembled": DialogManager._parse_yes_no,
+    "electronics_defect_claimed": DialogManager._parse_defect_claim,
+    "defect_evidence_present": DialogManager._parse_yes_no,
+    "customer_name": DialogManager._parse_name,
+    "customer_phone": DialogManager._parse_phone,
+    "pickup_address_json": DialogManager._parse_address,
+    "intent": DialogManager._parse_intent,
+    "category": DialogManager._parse_category,
+}
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import bisect
 from dataclasses import dataclass
-import json
+import functools
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
 
 from shop_agent.state import PolicyOutcome
 
 
-@dataclass
+TABLE_INTENTS = ("refund", "return", "replacement", "store_credit", "discount")
+ITEM_OPENED_STATES = (None, True, False)
+_WINDOW_INTENTS = frozenset({"refund", "return", "replacement"})
+_REFUND_INTENTS = frozenset({"refund", "return"})
+
+
+@dataclass(frozen=True, slots=True)
 class CategoryPolicy:
     name: str
     return_window_days: int
@@ -18,24 +27,46 @@ class CategoryPolicy:
     special_constraints: List[str]
 
 
+@functools.lru_cache(maxsize=4)
+def _load_policies(path: str, mtime_ns: int) -> Dict[str, CategoryPolicy]:
+    payload = orjson.loads(Path(path).read_bytes())
+    categories = {}
+    for name, data in payload["categories"].items():
+        categories[name] = CategoryPolicy(
+            name=name,
+            return_window_days=data["return_window_days"],
+            allowed_outcomes=list(data["allowed_outcomes"]),
+            discount_cap_percent=float(data["discount_cap_percent"]),
+            tiered_discounts=list(data.get("tiered_discounts", [])),
+            special_constraints=list(data.get("special_constraints", [])),
+        )
+    return categories
+
+
 class PolicyEngine:
     def __init__(self, policies: Dict[str, CategoryPolicy]):
         self.policies = policies
+        self._day_breakpoints = {
+            name: self._breakpoints(policy) for name, policy in policies.items()
+        }
+        self._tier_arrays = {
+            name: tuple(
+                sorted(
+                    (int(tier["max_days"]), float(tier["percent"]))
+                    for tier in policy.tiered_discounts
+                )
+            )
+            for name, policy in policies.items()
+        }
+        self._allowed_sets = {
+            name: frozenset(policy.allowed_outcomes) for name, policy in policies.items()
+        }
+        self._table = self._build_table()
 
     @classmethod
     def from_file(cls, path: Path) -> "PolicyEngine":
-        payload = json.loads(path.read_text(encoding="utf-8"))
-        categories = {}
-        for name, data in payload["categories"].items():
-            categories[name] = CategoryPolicy(
-                name=name,
-                return_window_days=data["return_window_days"],
-                allowed_outcomes=list(data["allowed_outcomes"]),
-                discount_cap_percent=float(data["discount_cap_percent"]),
-                tiered_discounts=list(data.get("tiered_discounts", [])),
-                special_constraints=list(data.get("special_constraints", [])),
-            )
-        return cls(categories)
+        resolved = path.resolve()
+        return cls(_load_policies(str(resolved), resolved.stat().st_mtime_ns))
 
     def evaluate(
         self,
@@ -44,6 +75,61 @@ class PolicyEngine:
         days_since_purchase: Optional[int],
         item_opened: Optional[bool],
         requested_discount: Optional[float],
+    ) -> PolicyOutcome:
+        breakpoints = self._day_breakpoints.get(category)
+        if breakpoints is None:
+            return self._evaluate(
+                category, intent, days_since_purchase, item_opened, requested_discount
+            )
+        bucket = None
+        if days_since_purchase is not None:
+            bucket = bisect.bisect_left(breakpoints, int(days_since_purchase))
+        outcome = self._table.get((category, intent, bucket, item_opened))
+        if outcome is None:
+            return self._evaluate(
+                category, intent, days_since_purchase, item_opened, requested_discount
+            )
+        if requested_discount is None or outcome.outcome != "discount":
+            return outcome
+        return PolicyOutcome(
+            eligible=outcome.eligible,
+            outcome=outcome.outcome,
+            discount_percent=min(outcome.discount_percent, requested_discount),
+            reason=outcome.reason,
+            refused_excess_discount=(
+                requested_discount > self.policies[category].discount_cap_percent
+            ),
+        )
+
+    @staticmethod
+    def _breakpoints(policy: CategoryPolicy) -> List[int]:
+        limits = {int(policy.return_window_days)}
+        limits.update(int(tier["max_days"]) for tier in policy.tiered_discounts)
+        return sorted(limits)
+
+    def _build_table(self) -> Dict[Tuple[str, str, Optional[int], Optional[bool]], PolicyOutcome]:
+        table = {}
+        for name, policy in self.policies.items():
+            breakpoints = self._day_breakpoints[name]
+            buckets: List[Tuple[Optional[int], Optional[int]]] = [(None, None)]
+            buckets.extend((index, days) for index, days in enumerate(breakpoints))
+            buckets.append((len(breakpoints), breakpoints[-1] + 1))
+            intents = dict.fromkeys(TABLE_INTENTS + tuple(policy.allowed_outcomes))
+            for intent in intents:
+                for bucket, days in buckets:
+                    for item_opened in ITEM_OPENED_STATES:
+                        table[(name, intent, bucket, item_opened)] = self._evaluate(
+                            name, intent, days, item_opened, None
+                        )
+        return table
+
+    def _evaluate(
+        self,
+        category: str,
+        intent: str,
+        days_since_purchase: Optional[int],
+        item_opened: Optional[bool],
+        requested_discount: Optional[float],
     ) -> PolicyOutcome:
         policy = self.policies[category]
         missing = []
@@ -63,7 +149,7 @@ class PolicyEngine:
         days_since_purchase = int(days_since_purchase)
         within_window = days_since_purchase <= policy.return_window_days
 
-        if intent in {"refund", "return", "replacement"} and not within_window:
+        if intent in _WINDOW_INTENTS and not within_window:
             return PolicyOutcome(
                 eligible=False,
                 outcome="not_eligible",
@@ -71,7 +157,7 @@ class PolicyEngine:
                 reason="Return window exceeded based on store policy.",
             )
 
-        if category == "Headphones & Audio" and intent in {"refund", "return"} and item_opened:
+        if category == "Headphones & Audio" and intent in _REFUND_INTENTS and item_opened:
             return PolicyOutcome(
                 eligible=False,
                 outcome="not_eligible",
@@ -79,7 +165,7 @@ class PolicyEngine:
                 reason="Opened in-ear headphones are not eligible for refund.",
             )
 
-        if intent not in policy.allowed_outcomes:
+        if intent not in self._allowed_sets[category]:
             return PolicyOutcome(
                 eligible=False,
                 outcome="not_eligible",
@@ -111,7 +197,7 @@ class PolicyEngine:
         )
 
     def _determine_discount(self, policy: CategoryPolicy, days_since_purchase: int) -> float:
-        for tier in policy.tiered_discounts:
-            if days_since_purchase <= tier["max_days"]:
-                return float(tier["percent"])
+        for max_days, percent in self._tier_arrays[policy.name]:
+            if days_since_purchase <= max_days:
+                return percent
         return float(policy.discount_cap_percent)
@@ -1,28 +1,41 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
 import hashlib
 import hmac
+import http.client
 import json
 import os
 import re
-import urllib.parse
-import urllib.request
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Optional
 
 
+PRICE_CACHE_TTL_SECONDS = 3600.0
+PRICE_CACHE_NEGATIVE_TTL_SECONDS = 60.0
+PRICE_CACHE_MAX_ENTRIES = 10_000
+PAAPI_TIMEOUT_SECONDS = 10
+
+_ALGORITHM = "AWS4-HMAC-SHA256"
+_SERVICE = "ProductAdvertisingAPI"
+_CANONICAL_URI = "/paapi5/getitems"
+_CONTENT_TYPE = "application/json; charset=utf-8"
+_SIGNED_HEADERS = "content-type;host;x-amz-date;x-amz-target"
+_X_AMZ_TARGET = "com.amazon.paapi5.v1.ProductAdvertisingAPIv1.GetItems"
+
+_ASIN_BARE = re.compile(r"[A-Z0-9]{10}")
+_ASIN_URL = re.compile(r"/(?:dp|gp/product|product)/([A-Z0-9]{10})")
+
+
 def extract_asin(value: str) -> Optional[str]:
     candidate = value.strip()
-    if re.fullmatch(r"[A-Z0-9]{10}", candidate):
+    if _ASIN_BARE.fullmatch(candidate):
         return candidate
-    match = re.search(r"/dp/([A-Z0-9]{10})", candidate)
-    if match:
-        return match.group(1)
-    match = re.search(r"/gp/product/([A-Z0-9]{10})", candidate)
-    if match:
-        return match.group(1)
-    match = re.search(r"/product/([A-Z0-9]{10})", candidate)
+    match = _ASIN_URL.search(candidate)
     if match:
         return match.group(1)
     return None
@@ -32,13 +45,78 @@ class PriceProvider:
     def get_price(self, asin: str) -> Optional[float]:
         raise NotImplementedError
 
+    async def aget_price(self, asin: str) -> Optional[float]:
+        return await asyncio.to_thread(self.get_price, asin)
+
+    def close(self) -> None:
+        return None
+
 
 class NullPriceProvider(PriceProvider):
     def get_price(self, asin: str) -> Optional[float]:
         return None
 
+    async def aget_price(self, asin: str) -> Optional[float]:
+        return None
 
-@dataclass
+
+class CachingPriceProvider(PriceProvider):
+    def __init__(
+        self,
+        inner: PriceProvider,
+        ttl: float = PRICE_CACHE_TTL_SECONDS,
+        negative_ttl: float = PRICE_CACHE_NEGATIVE_TTL_SECONDS,
+        max_entries: int = PRICE_CACHE_MAX_ENTRIES,
+    ):
+        self.inner = inner
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, tuple[float, Optional[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_price(self, asin: str) -> Optional[float]:
+        hit, price = self._lookup(asin)
+        if hit:
+            return price
+        price = self.inner.get_price(asin)
+        self._store(asin, price)
+        return price
+
+    async def aget_price(self, asin: str) -> Optional[float]:
+        hit, price = self._lookup(asin)
+        if hit:
+            return price
+        price = await self.inner.aget_price(asin)
+        self._store(asin, price)
+        return price
+
+    def close(self) -> None:
+        self.inner.close()
+
+    def _lookup(self, asin: str) -> tuple[bool, Optional[float]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(asin)
+            if entry is None:
+                return False, None
+            expires_at, price = entry
+            if now >= expires_at:
+                del self._cache[asin]
+                return False, None
+            self._cache.move_to_end(asin)
+            return True, price
+
+    def _store(self, asin: str, price: Optional[float]) -> None:
+        ttl = self.ttl if price is not None else self.negative_ttl
+        with self._lock:
+            self._cache[asin] = (time.monotonic() + ttl, price)
+            self._cache.move_to_end(asin)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+
+@dataclass(frozen=True, slots=True)
 class AmazonPAAPIConfig:
     access_key: str
     secret_key: str
@@ -50,6 +128,10 @@ class AmazonPAAPIConfig:
 class AmazonPAAPIPriceProvider(PriceProvider):
     def __init__(self, config: AmazonPAAPIConfig):
         self.config = config
+        self._host_header = f"host:{config.host}\n"
+        self._signing_key: tuple[str, bytes] | None = None
+        self._conn: http.client.HTTPSConnection | None = None
+        self._conn_lock = threading.Lock()
 
     @classmethod
     def from_env(cls) -> Optional["AmazonPAAPIPriceProvider"]:
@@ -80,15 +162,44 @@ class AmazonPAAPIPriceProvider(PriceProvider):
         }
         body = json.dumps(payload)
         headers = self._signed_headers(body)
-        url = f"https://{self.config.host}/paapi5/getitems"
-        request = urllib.request.Request(url, data=body.encode("utf-8"), headers=headers, method="POST")
         try:
-            with urllib.request.urlopen(request, timeout=10) as response:
-                data = json.loads(response.read().decode("utf-8"))
+            data = self._post(body.encode("utf-8"), headers)
         except Exception:
             return None
+        if data is None:
+            return None
         return self._extract_price(data)
 
+    def close(self) -> None:
+        with self._conn_lock:
+            self._close_connection()
+
+    def _post(self, body: bytes, headers: dict) -> Optional[dict]:
+        with self._conn_lock:
+            for attempt in range(2):
+                if self._conn is None:
+                    self._conn = http.client.HTTPSConnection(
+                        self.config.host, timeout=PAAPI_TIMEOUT_SECONDS
+                    )
+                try:
+                    self._conn.request("POST", _CANONICAL_URI, body=body, headers=headers)
+                    response = self._conn.getresponse()
+                    raw = response.read()
+                except (http.client.HTTPException, OSError):
+                    self._close_connection()
+                    if attempt:
+                        raise
+                    continue
+                if response.status >= 400:
+                    return None
+                return json.loads(raw)
+        return None
+
+    def _close_connection(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
     def _extract_price(self, data: dict) -> Optional[float]:
         items = data.get("ItemsResult", {}).get("Items", [])
         if not items:
@@ -105,50 +216,54 @@ class AmazonPAAPIPriceProvider(PriceProvider):
             return None
 
     def _signed_headers(self, payload: str) -> dict:
-        now = dt.datetime.utcnow()
+        now = dt.datetime.now(dt.timezone.utc)
         amz_date = now.strftime("%Y%m%dT%H%M%SZ")
-        date_stamp = now.strftime("%Y%m%d")
-        canonical_uri = "/paapi5/getitems"
-        canonical_querystring = ""
-        content_type = "application/json; charset=utf-8"
-        signed_headers = "content-type;host;x-amz-date;x-amz-target"
+        date_stamp = amz_date[:8]
         canonical_headers = (
-            f"content-type:{content_type}\n"
-            f"host:{self.config.host}\n"
+            f"content-type:{_CONTENT_TYPE}\n"
+            f"{self._host_header}"
             f"x-amz-date:{amz_date}\n"
-            "x-amz-target:com.amazon.paapi5.v1.ProductAdvertisingAPIv1.GetItems\n"
+            f"x-amz-target:{_X_AMZ_TARGET}\n"
         )
         payload_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
         canonical_request = (
             "POST\n"
-            f"{canonical_uri}\n"
-            f"{canonical_querystring}\n"
+            f"{_CANONICAL_URI}\n"
+            "\n"
             f"{canonical_headers}\n"
-            f"{signed_headers}\n"
+            f"{_SIGNED_HEADERS}\n"
             f"{payload_hash}"
         )
-        algorithm = "AWS4-HMAC-SHA256"
-        credential_scope = f"{date_stamp}/{self.config.region}/ProductAdvertisingAPI/aws4_request"
+        credential_scope = f"{date_stamp}/{self.config.region}/{_SERVICE}/aws4_request"
         string_to_sign = (
-            f"{algorithm}\n{amz_date}\n{credential_scope}\n"
+            f"{_ALGORITHM}\n{amz_date}\n{credential_scope}\n"
             f"{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}"
         )
-        signing_key = self._get_signature_key(
-            self.config.secret_key, date_stamp, self.config.region, "ProductAdvertisingAPI"
-        )
-        signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        signature = hmac.new(
+            self._daily_signing_key(date_stamp), string_to_sign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
         authorization_header = (
-            f"{algorithm} Credential={self.config.access_key}/{credential_scope}, "
-            f"SignedHeaders={signed_headers}, Signature={signature}"
+            f"{_ALGORITHM} Credential={self.config.access_key}/{credential_scope}, "
+            f"SignedHeaders={_SIGNED_HEADERS}, Signature={signature}"
         )
         return {
-            "Content-Type": content_type,
+            "Content-Type": _CONTENT_TYPE,
             "X-Amz-Date": amz_date,
-            "X-Amz-Target": "com.amazon.paapi5.v1.ProductAdvertisingAPIv1.GetItems",
+            "X-Amz-Target": _X_AMZ_TARGET,
             "Authorization": authorization_header,
             "Host": self.config.host,
         }
 
+    def _daily_signing_key(self, date_stamp: str) -> bytes:
+        cached = self._signing_key
+        if cached is None or cached[0] != date_stamp:
+            key = self._get_signature_key(
+                self.config.secret_key, date_stamp, self.config.region, _SERVICE
+            )
+            cached = (date_stamp, key)
+            self._signing_key = cached
+        return cached[1]
+
     @staticmethod
     def _get_signature_key(key: str, date_stamp: str, region: str, service: str) -> bytes:
         k_date = hmac.new(f"AWS4{key}".encode("utf-8"), date_stamp.encode("utf-8"), hashlib.sha256).digest()
@@ -161,4 +276,4 @@ def build_price_provider() -> PriceProvider:
     provider = AmazonPAAPIPriceProvider.from_env()
     if provider is None:
         return NullPriceProvider()
-    return provider
+    return CachingPriceProvider(provider)
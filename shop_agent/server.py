@@ -1,64 +1,150 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
-from datetime import datetime
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 
-from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, UploadFile
+import orjson
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Request, UploadFile
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from pydantic import BaseModel
 
-from shop_agent.db import Attachment, Case, Message, get_session, init_db
-from shop_agent.gemini_client import GeminiClient
+from shop_agent.db import (
+    Attachment,
+    Case,
+    Message,
+    get_async_engine,
+    get_async_session,
+    get_session,
+    init_db,
+)
+from shop_agent.gemini_client import aclose_gemini_client, get_gemini_client
+from shop_agent.nlu_cache import get_nlu_cache
 from shop_agent.orchestrator import DialogManager
 
-app = FastAPI()
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 64 * 1024
+CORS_ALLOWED_ORIGINS = frozenset(
+    origin.strip() for origin in os.getenv("CORS_ALLOWED_ORIGINS", "*").split(",") if origin.strip()
+)
+ADMIN_CASES_LIMIT = 50
+ADMIN_CASES_CACHE_SECONDS = 2.0
+_ADMIN_CASE_COLUMNS = (
+    Case.id,
+    Case.created_at,
+    Case.updated_at,
+    Case.session_id,
+    Case.category,
+    Case.intent,
+    Case.decision,
+    Case.status,
+    Case.discount_percent,
+    Case.retention_step,
+)
+
+_admin_cases_cache: tuple[float, list[dict[str, Any]]] | None = None
+
+
+def _build_orchestrator() -> DialogManager:
+    return DialogManager(get_gemini_client(), cache=get_nlu_cache())
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    init_db()
+    app.state.orchestrator = _build_orchestrator()
+    try:
+        yield
+    finally:
+        await aclose_gemini_client()
+        await get_async_engine().dispose()
+
+
+class OrjsonResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+app = FastAPI(lifespan=_lifespan, default_response_class=OrjsonResponse)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=os.getenv("CORS_ALLOWED_ORIGINS", "*").split(","),
+    allow_origins=CORS_ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
 
-@app.on_event("startup")
-def _startup() -> None:
-    init_db()
+async def _get_orchestrator(request: Request) -> DialogManager:
+    return request.app.state.orchestrator
 
 
-def _build_orchestrator() -> DialogManager:
-    gemini = GeminiClient()
-    return DialogManager(gemini)
-
-
-def _admin_auth(x_admin_password: str = Header(default="")) -> None:
+async def _admin_auth(x_admin_password: str = Header(default="")) -> None:
     expected = os.getenv("ADMIN_PASSWORD")
     if not expected or x_admin_password != expected:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
-def _get_case(session: Session, session_id: str) -> Case:
-    case = session.query(Case).filter(Case.session_id == session_id).first()
+async def _get_case(session: AsyncSession, session_id: str) -> Case:
+    case = await session.scalar(
+        select(Case).where(Case.session_id == session_id).order_by(Case.id.desc()).limit(1)
+    )
     if case is None:
         case = Case(session_id=session_id)
         session.add(case)
-        session.commit()
-        session.refresh(case)
     return case
 
 
-def _log_message(session: Session, case_id: int, role: str, text: str) -> None:
-    message = Message(case_id=case_id, role=role, text=text)
-    session.add(message)
-    session.commit()
+async def _record_turn(session: AsyncSession, case: Case, user_text: str, reply: str) -> None:
+    await session.flush()
+    session.add_all(
+        [
+            Message(case_id=case.id, role="user", text=user_text),
+            Message(case_id=case.id, role="assistant", text=reply),
+        ]
+    )
+
+
+async def _read_image(image: UploadFile) -> bytes:
+    if image.size is not None and image.size > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    buffer = bytearray()
+    while chunk := await image.read(UPLOAD_CHUNK_BYTES):
+        buffer += chunk
+        if len(buffer) > MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail="Image too large")
+    return bytes(buffer)
+
+
+def _invalidate_admin_cases() -> None:
+    global _admin_cases_cache
+    _admin_cases_cache = None
+
+
+def _storage_path(case_id: int, filename: str | None) -> str:
+    shard = hashlib.blake2b(str(case_id).encode(), digest_size=2).hexdigest()
+    name = f"{case_id}_{os.path.basename(filename or '')}"
+    return os.path.join(os.getcwd(), "storage", shard[:2], shard[2:], name)
+
+
+def _store_image(storage_path: str, image_bytes: bytes) -> None:
+    os.makedirs(os.path.dirname(storage_path), exist_ok=True)
+    with open(storage_path, "wb") as handle:
+        handle.write(image_bytes)
 
 
 @app.get("/health")
-def health() -> JSONResponse:
-    return JSONResponse({"ok": True})
+async def health() -> OrjsonResponse:
+    return OrjsonResponse({"ok": True})
 
 
 class ChatRequest(BaseModel):
@@ -67,18 +153,18 @@ class ChatRequest(BaseModel):
 
 
 @app.post("/api/chat")
-async def chat(payload: ChatRequest) -> JSONResponse:
-    session = get_session()
-    orchestrator = _build_orchestrator()
+async def chat(
+    payload: ChatRequest,
+    session: AsyncSession = Depends(get_async_session),
+    orchestrator: DialogManager = Depends(_get_orchestrator),
+) -> OrjsonResponse:
     session_id = payload.session_id or os.urandom(8).hex()
-    case = _get_case(session, session_id)
-    _log_message(session, case.id, "user", payload.message)
-    reply, status, next_question = orchestrator.handle_turn(case, payload.message)
-    case.updated_at = datetime.utcnow()
-    session.add(case)
-    session.commit()
-    _log_message(session, case.id, "assistant", reply)
-    return JSONResponse(
+    case = await _get_case(session, session_id)
+    reply, status, next_question = await orchestrator.ahandle_turn(case, payload.message)
+    await _record_turn(session, case, payload.message, reply)
+    await session.commit()
+    _invalidate_admin_cases()
+    return OrjsonResponse(
         {
             "session_id": session_id,
             "reply": reply,
@@ -94,18 +180,17 @@ async def chat_with_image(
     session_id: str = Form(...),
     message: str = Form(...),
     image: UploadFile = File(...),
-) -> JSONResponse:
-    session = get_session()
-    orchestrator = _build_orchestrator()
-    case = _get_case(session, session_id)
-    image_bytes = await image.read()
-    _log_message(session, case.id, "user", message)
-    storage_dir = os.path.join(os.getcwd(), "storage")
-    os.makedirs(storage_dir, exist_ok=True)
-    filename = f"{case.id}_{image.filename}"
-    storage_path = os.path.join(storage_dir, filename)
-    with open(storage_path, "wb") as handle:
-        handle.write(image_bytes)
+    session: AsyncSession = Depends(get_async_session),
+    orchestrator: DialogManager = Depends(_get_orchestrator),
+) -> OrjsonResponse:
+    image_bytes = await _read_image(image)
+    case = await _get_case(session, session_id)
+    reply, status, next_question = await orchestrator.ahandle_turn(
+        case, message, image_bytes=image_bytes, image_mime_type=image.content_type
+    )
+    await _record_turn(session, case, message, reply)
+    storage_path = _storage_path(case.id, image.filename)
+    await asyncio.to_thread(_store_image, storage_path, image_bytes)
     attachment = Attachment(
         case_id=case.id,
         filename=image.filename,
@@ -113,13 +198,9 @@ async def chat_with_image(
         storage_path=storage_path,
     )
     session.add(attachment)
-    session.commit()
-    reply, status, next_question = orchestrator.handle_turn(case, message, image_bytes=image_bytes)
-    case.updated_at = datetime.utcnow()
-    session.add(case)
-    session.commit()
-    _log_message(session, case.id, "assistant", reply)
-    return JSONResponse(
+    await session.commit()
+    _invalidate_admin_cases()
+    return OrjsonResponse(
         {
             "session_id": session_id,
             "reply": reply,
@@ -131,35 +212,37 @@ async def chat_with_image(
 
 
 @app.get("/api/admin/cases")
-def admin_cases(_: None = Depends(_admin_auth)) -> JSONResponse:
-    session = get_session()
-    cases = session.query(Case).order_by(Case.created_at.desc()).limit(50).all()
-    payload = [
-        {
-            "id": case.id,
-            "created_at": case.created_at.isoformat(),
-            "updated_at": case.updated_at.isoformat(),
-            "session_id": case.session_id,
-            "category": case.category,
-            "intent": case.intent,
-            "decision": case.decision,
-            "status": case.status,
-            "discount_percent": case.discount_percent,
-            "retention_step": case.retention_step,
-        }
-        for case in cases
-    ]
-    return JSONResponse(payload)
+def admin_cases(_: None = Depends(_admin_auth)) -> OrjsonResponse:
+    global _admin_cases_cache
+    cached = _admin_cases_cache
+    now = time.monotonic()
+    if cached is not None and now < cached[0]:
+        return OrjsonResponse(cached[1])
+    with get_session() as session:
+        rows = session.execute(
+            select(*_ADMIN_CASE_COLUMNS)
+            .order_by(Case.id.desc())
+            .limit(ADMIN_CASES_LIMIT)
+        ).mappings()
+        payload = [dict(row) for row in rows]
+    _admin_cases_cache = (now + ADMIN_CASES_CACHE_SECONDS, payload)
+    return OrjsonResponse(payload)
 
 
 @app.get("/api/admin/cases/{case_id}")
-def admin_case(case_id: int, _: None = Depends(_admin_auth)) -> JSONResponse:
-    session = get_session()
-    case = session.query(Case).filter(Case.id == case_id).first()
-    if not case:
-        raise HTTPException(status_code=404, detail="Not found")
-    messages = session.query(Message).filter(Message.case_id == case_id).all()
-    attachments = session.query(Attachment).filter(Attachment.case_id == case_id).all()
+def admin_case(case_id: int, _: None = Depends(_admin_auth)) -> OrjsonResponse:
+    with get_session() as session:
+        case = (
+            session.scalars(
+                select(Case)
+                .where(Case.id == case_id)
+                .options(joinedload(Case.messages), selectinload(Case.attachments))
+            )
+            .unique()
+            .one_or_none()
+        )
+        if not case:
+            raise HTTPException(status_code=404, detail="Not found")
     payload = {
         "case": {
             "id": case.id,
@@ -182,8 +265,8 @@ def admin_case(case_id: int, _: None = Depends(_admin_auth)) -> JSONResponse:
             "ticket_number": case.ticket_number,
         },
         "messages": [
-            {"id": msg.id, "role": msg.role, "text": msg.text, "created_at": msg.created_at.isoformat()}
-            for msg in messages
+            {"id": msg.id, "role": msg.role, "text": msg.text, "created_at": msg.created_at}
+            for msg in case.messages
         ],
         "attachments": [
             {
@@ -192,7 +275,7 @@ def admin_case(case_id: int, _: None = Depends(_admin_auth)) -> JSONResponse:
                 "content_type": attachment.content_type,
                 "storage_path": attachment.storage_path,
             }
-            for attachment in attachments
+            for attachment in case.attachments
         ],
     }
-    return JSONResponse(payload)
+    return OrjsonResponse(payload)
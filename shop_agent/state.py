@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-import json
-from dataclasses import asdict, dataclass, field
+import functools
+import os
+from dataclasses import dataclass, field, fields
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+import orjson
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class PolicyOutcome:
     eligible: bool
     outcome: str
@@ -15,7 +18,7 @@ class PolicyOutcome:
     refused_excess_discount: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionState:
     session_id: str
     inferred_intent: str = "unknown"
@@ -38,10 +41,7 @@ class SessionState:
     turn_count: int = 0
 
     def to_json(self) -> str:
-        payload = asdict(self)
-        if self.last_policy_outcome is not None:
-            payload["last_policy_outcome"] = asdict(self.last_policy_outcome)
-        return json.dumps(payload, indent=2)
+        return orjson.dumps(self, option=orjson.OPT_INDENT_2).decode()
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "SessionState":
@@ -50,28 +50,35 @@ class SessionState:
         if outcome:
             state.last_policy_outcome = PolicyOutcome(**outcome)
         for key, value in data.items():
-            if key == "last_policy_outcome":
-                continue
-            if hasattr(state, key):
+            if key in _SESSION_FIELDS:
                 setattr(state, key, value)
         return state
 
 
-def session_path(session_id: str, base_dir: Path | None = None) -> Path:
-    root = base_dir or Path.cwd()
+_SESSION_FIELDS = frozenset(f.name for f in fields(SessionState)) - {"last_policy_outcome"}
+
+
+@functools.lru_cache(maxsize=None)
+def _sessions_dir(root: Path) -> Path:
     sessions_dir = root / "sessions"
     sessions_dir.mkdir(exist_ok=True)
-    return sessions_dir / f"{session_id}.json"
+    return sessions_dir
+
+
+def session_path(session_id: str, base_dir: Path | None = None) -> Path:
+    return _sessions_dir(base_dir or Path.cwd()) / f"{session_id}.json"
 
 
 def load_session(session_id: str, base_dir: Path | None = None) -> SessionState:
     path = session_path(session_id, base_dir)
     if not path.exists():
         return SessionState(session_id=session_id)
-    data = json.loads(path.read_text(encoding="utf-8"))
+    data = orjson.loads(path.read_bytes())
     return SessionState.from_dict(data)
 
 
 def save_session(state: SessionState, base_dir: Path | None = None) -> None:
     path = session_path(state.session_id, base_dir)
-    path.write_text(state.to_json(), encoding="utf-8")
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(orjson.dumps(state))
+    os.replace(tmp_path, path)
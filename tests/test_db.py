@@ -0,0 +1,29 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from shop_agent import db
+
+
+BASELINE_SCHEMA = (
+    "CREATE TABLE cases (id INTEGER NOT NULL PRIMARY KEY, created_at DATETIME NOT NULL, "
+    "updated_at DATETIME NOT NULL, session_id VARCHAR(128) NOT NULL, turn_count INTEGER NOT NULL)",
+    "CREATE TABLE messages (id INTEGER NOT NULL PRIMARY KEY, case_id INTEGER NOT NULL, "
+    "created_at DATETIME NOT NULL, role VARCHAR(16) NOT NULL, text TEXT NOT NULL)",
+)
+
+
+def test_inserts_into_baseline_schema(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+    monkeypatch.setattr(db, "engine", engine)
+    db.init_db()
+    with Session(engine) as session:
+        case = db.Case(session_id="s1")
+        session.add(case)
+        session.flush()
+        session.add(db.Message(case_id=case.id, role="user", text="hi"))
+        session.commit()
+        assert case.created_at is not None
+        assert case.updated_at is not None
@@ -1,5 +1,11 @@
-from shop_agent.models import ImageClassification, NLUUpdate
-from shop_agent.orchestrator import DialogManager
+import asyncio
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from shop_agent.models import ImageClassification, IntentAndClassification, NLUUpdate
+from shop_agent.orchestrator import DialogManager, _downscale_image
 
 
 class FakeCase:
@@ -9,6 +15,7 @@ class FakeCase:
         self.intent = kwargs.get("intent")
         self.last_question_slot = kwargs.get("last_question_slot")
         self.asked_slots = kwargs.get("asked_slots")
+        self.asked_slots_mask = kwargs.get("asked_slots_mask")
         self.days_since_purchase = kwargs.get("days_since_purchase")
         self.furniture_assembled = kwargs.get("furniture_assembled")
         self.turn_count = kwargs.get("turn_count", 0)
@@ -22,6 +29,7 @@ class FakeCase:
         self.retention_step = None
         self.discount_percent = None
         self.status = None
+        self.nlu_complete = None
 
 
 class DummyGemini:
@@ -31,17 +39,32 @@ class DummyGemini:
     def generate_json(self, prompt, schema_model, system_instruction=None):
         return self.nlu_update
 
-    def generate_json_with_image(self, prompt, image_bytes, schema_model, system_instruction=None):
-        return ImageClassification(
+    def generate_json_with_image(
+        self, prompt, image_bytes, schema_model, system_instruction=None, mime_type="image/jpeg"
+    ):
+        classification = ImageClassification(
             category="FURNITURE",
             confidence=0.9,
             observations="Over-ear headset",
             needs_clarification=False,
         )
+        if schema_model is IntentAndClassification:
+            return IntentAndClassification(nlu=self.nlu_update, classification=classification)
+        return classification
 
     def generate_text(self, prompt: str) -> str:
         return "Policy response."
 
+    async def agenerate_json(self, prompt, schema_model, system_instruction=None):
+        return self.generate_json(prompt, schema_model, system_instruction)
+
+    async def agenerate_json_with_image(
+        self, prompt, image_bytes, schema_model, system_instruction=None, mime_type="image/jpeg"
+    ):
+        return self.generate_json_with_image(
+            prompt, image_bytes, schema_model, system_instruction, mime_type
+        )
+
 
 def test_followup_days_parser_moves_to_next_slot():
     case = FakeCase(
@@ -69,3 +92,96 @@ def test_followup_assembled_parser_sets_false():
     response, _, _ = orch.handle_turn(case, "not assembled")
     assert case.furniture_assembled is False
     assert response
+
+
+def test_answered_followup_skips_nlu():
+    class NoNLUGemini(DummyGemini):
+        def generate_json(self, prompt, schema_model, system_instruction=None):
+            raise AssertionError("NLU should not run")
+
+    case = FakeCase(
+        category="FURNITURE",
+        intent="WANT_REFUND",
+        last_question_slot="days_since_purchase",
+    )
+    DialogManager(NoNLUGemini()).handle_turn(case, "12 days")
+    assert case.days_since_purchase == 12
+    assert case.decision == "retention"
+
+
+def test_filler_message_skips_nlu():
+    class NoNLUGemini(DummyGemini):
+        def generate_json(self, prompt, schema_model, system_instruction=None):
+            raise AssertionError("NLU should not run")
+
+    case = FakeCase(category="FURNITURE")
+    _, _, next_question = DialogManager(NoNLUGemini()).handle_turn(case, "Thanks!")
+    assert next_question == "intent"
+
+
+def test_answered_followup_with_extra_detail_still_runs_nlu():
+    case = FakeCase(category="FURNITURE", last_question_slot="days_since_purchase")
+    orch = DialogManager(DummyGemini(NLUUpdate(intent="DID_NOT_LIKE")))
+    orch.handle_turn(case, "about 3 days ago, and honestly I just did not like it")
+    assert case.days_since_purchase == 3
+    assert case.intent == "DID_NOT_LIKE"
+
+
+def test_yes_no_parser_matches_whole_words():
+    assert DialogManager._parse_yes_no("Да, собрано") is True
+    assert DialogManager._parse_yes_no("nope") is False
+    assert DialogManager._parse_yes_no("I don't know yet") is None
+
+
+def test_image_turn_applies_classification_then_nlu():
+    case = FakeCase(session_id="s3")
+    orch = DialogManager(DummyGemini(NLUUpdate(category="ELECTRONICS", intent="WANT_REFUND")))
+    response, _, next_question = asyncio.run(orch.ahandle_turn(case, "It came like this", b"jpeg"))
+    assert case.category == "ELECTRONICS"
+    assert case.intent == "WANT_REFUND"
+    assert next_question == "electronics_defect_claimed"
+    assert "defective" in response.lower()
+
+
+def test_large_image_is_downscaled_before_upload():
+    image_module = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    image_module.new("RGB", (3000, 2000), (200, 10, 10)).save(buffer, "PNG")
+    image_bytes, mime_type = _downscale_image(buffer.getvalue(), "image/png")
+    assert mime_type == "image/jpeg"
+    with image_module.open(io.BytesIO(image_bytes)) as resized:
+        assert max(resized.size) == 1024
+
+
+def test_exif_orientation_is_applied_before_reencoding():
+    image_module = pytest.importorskip("PIL.Image")
+    image = image_module.new("RGB", (2000, 1000), (200, 10, 10))
+    exif = image.getexif()
+    exif[0x0112] = 6
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", exif=exif.tobytes())
+    image_bytes, mime_type = _downscale_image(buffer.getvalue(), "image/jpeg")
+    assert mime_type == "image/jpeg"
+    with image_module.open(io.BytesIO(image_bytes)) as resized:
+        assert resized.size == (512, 1024)
+        assert 0x0112 not in resized.getexif()
+
+
+def test_oversized_image_is_sent_unchanged():
+    image_module = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    image_module.new("1", (14000, 14000)).save(buffer, "PNG")
+    image_bytes = buffer.getvalue()
+    assert _downscale_image(image_bytes, "image/png") == (image_bytes, "image/png")
+    buffer = io.BytesIO()
+    image_module.new("1", (8000, 6000)).save(buffer, "PNG")
+    assert _downscale_image(buffer.getvalue(), "image/png")[1] == "image/png"
+
+
+def test_days_from_date_rejects_malformed_dates():
+    now = datetime(2024, 1, 10, tzinfo=timezone.utc)
+    assert DialogManager._days_from_date("2024-01-05", now) == 5
+    assert DialogManager._days_from_date("2024-01-05T00:00:00", now) == 5
+    assert DialogManager._days_from_date("2024/01/05", now) is None
+    assert DialogManager._days_from_date("2024x01x05", now) is None
+    assert DialogManager._days_from_date("2024-+1-05", now) is None
@@ -0,0 +1,21 @@
+import asyncio
+
+import pytest
+
+
+def test_client_can_be_reused_across_event_loops():
+    pytest.importorskip("google.genai")
+    from shop_agent.gemini_client import GeminiClient
+
+    client = GeminiClient(api_key="test-key")
+
+    async def call() -> str:
+        async def request() -> str:
+            await asyncio.sleep(0)
+            return "ok"
+
+        results = await asyncio.gather(*(client._acall(request) for _ in range(20)))
+        return results[0]
+
+    assert asyncio.run(call()) == "ok"
+    assert asyncio.run(call()) == "ok"
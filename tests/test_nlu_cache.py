@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+from shop_agent.models import ImageClassification, NLUUpdate
+from shop_agent.nlu_cache import NLUCache, cache_key
+from shop_agent.orchestrator import DialogManager
+
+
+class FakeCase:
+    def __init__(self):
+        self.category = None
+        self.intent = None
+        self.last_question_slot = None
+        self.asked_slots = None
+        self.asked_slots_mask = None
+        self.days_since_purchase = None
+        self.furniture_assembled = None
+        self.turn_count = 0
+        self.customer_name = None
+        self.pickup_address_json = None
+        self.customer_phone = None
+        self.purchase_date_iso = None
+        self.electronics_defect_claimed = None
+        self.defect_evidence_present = None
+        self.emergency_trigger = None
+        self.retention_step = None
+        self.discount_percent = None
+        self.status = None
+        self.nlu_complete = None
+
+
+class CountingGemini:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_json(self, prompt, schema_model, system_instruction=None):
+        self.calls += 1
+        return NLUUpdate(category="FURNITURE", intent="WANT_REFUND")
+
+
+def test_roundtrip_and_stale_rows_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    key = cache_key("NLUUpdate", "my chair broke")
+    NLUCache(path).set(key, NLUUpdate(category="FURNITURE"))
+    cache = NLUCache(path)
+    assert cache.get(key, NLUUpdate).category == "FURNITURE"
+    cache = NLUCache(path)
+    assert cache.get(key, ImageClassification) is None
+    assert cache.get(key, NLUUpdate) is None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    path = str(tmp_path / "cache.db")
+    key = cache_key("NLUUpdate", "my chair broke")
+    NLUCache(path).set(key, NLUUpdate(category="FURNITURE"))
+    assert NLUCache(path, ttl=0).get(key, NLUUpdate) is None
+    assert NLUCache(path).get(key, NLUUpdate) is None
+
+
+def test_key_separates_message_and_image_bytes():
+    assert cache_key("ImageClassification", "ab", b"c") != cache_key("ImageClassification", "a", b"bc")
+    assert cache_key("NLUUpdate", "hi") != cache_key("ImageClassification", "hi")
+
+
+def test_repeated_message_skips_gemini(tmp_path):
+    gemini = CountingGemini()
+    orch = DialogManager(gemini, cache=NLUCache(str(tmp_path / "cache.db")))
+    orch.handle_turn(FakeCase(), "I want a refund for my chair")
+    case = FakeCase()
+    orch.handle_turn(case, "I want a refund for my chair")
+    assert gemini.calls == 1
+    assert case.category == "FURNITURE"
+
+
+def test_async_turn_keeps_sqlite_off_the_event_loop(tmp_path):
+    class ThreadRecordingCache(NLUCache):
+        def __init__(self, path):
+            super().__init__(path)
+            self.threads = []
+
+        def get(self, key, schema_model):
+            self.threads.append(threading.get_ident())
+            return super().get(key, schema_model)
+
+        def set(self, key, result):
+            self.threads.append(threading.get_ident())
+            super().set(key, result)
+
+    class AsyncCountingGemini(CountingGemini):
+        async def agenerate_json(self, prompt, schema_model, system_instruction=None):
+            return self.generate_json(prompt, schema_model, system_instruction)
+
+    gemini = AsyncCountingGemini()
+    cache = ThreadRecordingCache(str(tmp_path / "cache.db"))
+    orch = DialogManager(gemini, cache=cache)
+    asyncio.run(orch.ahandle_turn(FakeCase(), "I want a refund for my chair"))
+    asyncio.run(orch.ahandle_turn(FakeCase(), "I want a refund for my chair"))
+    assert gemini.calls == 1
+    assert len(cache.threads) == 2
+    assert threading.get_ident() not in cache.threads
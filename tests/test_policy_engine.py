@@ -55,3 +55,18 @@ def test_furniture_return_window_exceeded():
         requested_discount=None,
     )
     assert outcome.eligible is False
+
+
+def test_from_file_reuses_parsed_policies():
+    assert _engine().policies is _engine().policies
+
+
+def test_decision_table_matches_direct_evaluation():
+    engine = _engine()
+    for category in engine.policies:
+        for intent in ("refund", "return", "replacement", "store_credit", "discount", "exchange"):
+            for days in (None, 0, 3, 7, 8, 14, 15, 21, 22, 30, 31, 45, 46, 90):
+                for item_opened in (None, True, False):
+                    for requested in (None, 5.0, 50.0):
+                        args = (category, intent, days, item_opened, requested)
+                        assert engine.evaluate(*args) == engine._evaluate(*args)
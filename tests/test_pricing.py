@@ -0,0 +1,38 @@
+import asyncio
+
+from shop_agent.pricing import CachingPriceProvider, PriceProvider, extract_asin
+
+
+class CountingPriceProvider(PriceProvider):
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = 0
+
+    def get_price(self, asin):
+        self.calls += 1
+        return self.prices.get(asin)
+
+
+def test_extract_asin_from_urls():
+    assert extract_asin("B0C1234567") == "B0C1234567"
+    assert extract_asin("https://www.amazon.com/dp/B0C1234567?th=1") == "B0C1234567"
+    assert extract_asin("https://www.amazon.com/gp/product/B0C1234567") == "B0C1234567"
+    assert extract_asin("no link here") is None
+    assert extract_asin(" 0316769487 ") == "0316769487"
+    assert extract_asin("https://www.amazon.com/dp/0316769487") == "0316769487"
+
+
+def test_caching_provider_reuses_prices_per_asin():
+    inner = CountingPriceProvider({"B0C1234567": 49.5})
+    provider = CachingPriceProvider(inner)
+    assert provider.get_price("B0C1234567") == 49.5
+    assert asyncio.run(provider.aget_price("B0C1234567")) == 49.5
+    assert inner.calls == 1
+
+
+def test_caching_provider_expires_missing_prices_sooner():
+    inner = CountingPriceProvider({})
+    provider = CachingPriceProvider(inner, negative_ttl=0)
+    assert provider.get_price("B0MISSING0") is None
+    assert provider.get_price("B0MISSING0") is None
+    assert inner.calls == 2
@@ -10,6 +10,7 @@ class FakeCase:
         self.turn_count = kwargs.get("turn_count", 0)
         self.last_question_slot = None
         self.asked_slots = None
+        self.asked_slots_mask = None
         self.days_since_purchase = None
         self.purchase_date_iso = None
         self.furniture_assembled = None
@@ -19,6 +20,7 @@ class FakeCase:
         self.retention_step = None
         self.discount_percent = None
         self.status = None
+        self.nlu_complete = None
         self.decision = None
         self.reason = None
         self.customer_name = None
@@ -33,7 +35,9 @@ class DummyGemini:
     def generate_json(self, prompt, schema_model, system_instruction=None):
         return self.nlu_update
 
-    def generate_json_with_image(self, prompt, image_bytes, schema_model, system_instruction=None):
+    def generate_json_with_image(
+        self, prompt, image_bytes, schema_model, system_instruction=None, mime_type="image/jpeg"
+    ):
         raise AssertionError("Image not expected")
 
     def generate_text(self, prompt: str) -> str:
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from shop_agent import db, server
+from shop_agent.models import ImageClassification, IntentAndClassification, NLUUpdate
+from shop_agent.orchestrator import DialogManager
+
+
+ADMIN_HEADERS = {"X-Admin-Password": "secret"}
+
+
+class FakeGemini:
+    def __init__(self):
+        self.nlu_update = NLUUpdate(category="FURNITURE", intent="WANT_REFUND")
+
+    async def agenerate_json(self, prompt, schema_model, system_instruction=None):
+        return self.nlu_update
+
+    async def agenerate_json_with_image(
+        self, prompt, image_bytes, schema_model, system_instruction=None, mime_type="image/jpeg"
+    ):
+        classification = ImageClassification(
+            category="FURNITURE",
+            confidence=0.9,
+            observations="Broken chair leg",
+            needs_clarification=False,
+        )
+        if schema_model is IntentAndClassification:
+            return IntentAndClassification(nlu=self.nlu_update, classification=classification)
+        return classification
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'server.db'}")
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(db, "SessionLocal", sessionmaker(bind=engine, autoflush=False))
+    monkeypatch.setattr(server, "_build_orchestrator", lambda: DialogManager(FakeGemini()))
+    monkeypatch.setattr(server, "_admin_cases_cache", None)
+    monkeypatch.setenv("ADMIN_PASSWORD", "secret")
+    monkeypatch.chdir(tmp_path)
+    db.get_async_engine.cache_clear()
+    db._async_session_factory.cache_clear()
+    with TestClient(server.app) as test_client:
+        yield test_client
+    db.get_async_engine.cache_clear()
+    db._async_session_factory.cache_clear()
+
+
+def test_chat_turn_is_committed_through_async_session(client):
+    response = client.post("/api/chat", json={"message": "my chair broke, refund"})
+    assert response.status_code == 200
+    body = response.json()
+    assert str(db.get_async_engine().url).startswith("sqlite+aiosqlite")
+    with db.get_session() as session:
+        case = session.scalar(select(db.Case).where(db.Case.session_id == body["session_id"]))
+        assert case.id == body["case_id"]
+        roles = session.scalars(
+            select(db.Message.role).where(db.Message.case_id == case.id).order_by(db.Message.id)
+        ).all()
+    assert roles == ["user", "assistant"]
+
+
+def test_chat_continues_the_newest_case_for_a_session(client):
+    with db.get_session() as session:
+        cases = [db.Case(session_id="repeat"), db.Case(session_id="repeat")]
+        session.add_all(cases)
+        session.commit()
+        newest_id = cases[1].id
+    response = client.post("/api/chat", json={"session_id": "repeat", "message": "refund"})
+    assert response.json()["case_id"] == newest_id
+
+
+def test_admin_listing_refreshes_after_a_turn(client):
+    client.post("/api/chat", json={"session_id": "first", "message": "my chair, refund"})
+    listing = client.get("/api/admin/cases", headers=ADMIN_HEADERS).json()
+    assert [row["session_id"] for row in listing] == ["first"]
+    client.post("/api/chat", json={"session_id": "second", "message": "my sofa, refund"})
+    listing = client.get("/api/admin/cases", headers=ADMIN_HEADERS).json()
+    assert [row["session_id"] for row in listing] == ["second", "first"]
+
+
+def test_oversized_upload_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(server, "MAX_IMAGE_BYTES", 1024)
+    response = client.post(
+        "/api/chat-with-image",
+        data={"session_id": "s1", "message": "see photo"},
+        files={"image": ("chair.jpg", b"x" * 2048, "image/jpeg")},
+    )
+    assert response.status_code == 413
+    assert client.get("/api/admin/cases", headers=ADMIN_HEADERS).json() == []
+
+
+def test_attachment_is_stored_in_sharded_directory(client, tmp_path):
+    response = client.post(
+        "/api/chat-with-image",
+        data={"session_id": "s1", "message": "see photo"},
+        files={"image": ("../chair.jpg", b"image-bytes", "image/jpeg")},
+    )
+    case_id = response.json()["case_id"]
+    detail = client.get(f"/api/admin/cases/{case_id}", headers=ADMIN_HEADERS).json()
+    storage_path = detail["attachments"][0]["storage_path"]
+    parts = os.path.relpath(storage_path, tmp_path).split(os.sep)
+    assert parts[0] == "storage"
+    assert [len(part) for part in parts[1:3]] == [2, 2]
+    assert parts[3] == f"{case_id}_chair.jpg"
+    with open(storage_path, "rb") as handle:
+        assert handle.read() == b"image-bytes"
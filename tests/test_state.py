@@ -0,0 +1,64 @@
+import os
+
+import orjson
+
+from shop_agent import state as state_module
+from shop_agent.state import (
+    PolicyOutcome,
+    SessionState,
+    load_session,
+    save_session,
+    session_path,
+)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    saved = SessionState(
+        session_id="s1",
+        category="FURNITURE",
+        days_since_purchase=4,
+        asked_slots=["category", "days_since_purchase"],
+        last_policy_outcome=PolicyOutcome(True, "refund", 0.0, "Within 14 days."),
+        turn_count=3,
+    )
+    save_session(saved, tmp_path)
+    assert load_session("s1", tmp_path) == saved
+    assert load_session("missing", tmp_path) == SessionState(session_id="missing")
+
+
+def test_load_ignores_unknown_fields(tmp_path):
+    data = {
+        "session_id": "s2",
+        "category": "ART",
+        "legacy_flag": True,
+        "last_policy_outcome": {
+            "eligible": False,
+            "outcome": "retention",
+            "discount_percent": 6.0,
+            "reason": "Food is final sale.",
+        },
+    }
+    session_path("s2", tmp_path).write_bytes(orjson.dumps(data))
+    loaded = load_session("s2", tmp_path)
+    assert loaded.category == "ART"
+    assert loaded.last_policy_outcome == PolicyOutcome(
+        False, "retention", 6.0, "Food is final sale."
+    )
+    assert not hasattr(loaded, "legacy_flag")
+
+
+def test_save_replaces_the_file_through_a_tmp_file(tmp_path, monkeypatch):
+    replaced = []
+    real_replace = os.replace
+
+    def recording_replace(src, dst):
+        replaced.append((src, dst))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(state_module.os, "replace", recording_replace)
+    path = session_path("s3", tmp_path)
+    path.write_bytes(b"{}")
+    save_session(SessionState(session_id="s3", turn_count=2), tmp_path)
+    assert replaced == [(path.with_suffix(".tmp"), path)]
+    assert not path.with_suffix(".tmp").exists()
+    assert load_session("s3", tmp_path).turn_count == 2